@@ -1,10 +1,8 @@
 import subprocess
 import signal
-from time import sleep
 import os
 
-from drivebuildclient.AIExchangeService import AIExchangeService
-from drivebuildclient.aiExchangeMessages_pb2 import SimStateResponse, VehicleID
+from drivebuildclient.aiExchangeMessages_pb2 import VehicleID
 
 from lxml.etree import parse
 from lxml.etree import tostring
@@ -12,6 +10,9 @@ import importlib.util
 import sys
 
 from test_generator import TestGenerator
+from utils.pipeline import SimulationPipeline
+from utils.plotter import PlotRenderer
+from utils.simulator_pool import SimulatorPool
 
 
 my_env = os.environ
@@ -30,6 +31,42 @@ def kill_process(process):
     return False
 
 
+def add_data_requests(criteria, data_request_path):
+    """Replaces the ai tag of the ego car in a dbc file with the data requests of the AI.
+    :param criteria: Path to the dbc file.
+    :param data_request_path: Path to the python file with the add_data_requests function.
+    :return: Void.
+    """
+    # edit the xml
+    spec = importlib.util.spec_from_file_location("AI",
+                                                  data_request_path)
+    foo = importlib.util.module_from_spec(spec)
+    # Actually run the import
+    spec.loader.exec_module(foo)
+
+    # get ai element
+    double_backslash_dbc_path = str(criteria).replace("\\", "\\" + "\\")
+    tree = parse(double_backslash_dbc_path)
+    root = tree.getroot()
+    for i in range(0, len(root.getchildren())):
+        if root.getchildren()[i].tag == "{http://drivebuild.com}participants":
+            participant_block = root.getchildren()[i].getchildren()[0]
+            for j in range(0, len(participant_block)):
+                part_child = participant_block.getchildren()[j]
+                if part_child.tag == "{http://drivebuild.com}ai":
+                    pass
+                    part_child.clear()
+                    foo.add_data_requests(part_child, "ego")
+                    pass
+    # write the changed xml
+    # TODO pretty print
+    f = open(double_backslash_dbc_path, "w")
+    f.write(tostring(root, pretty_print=True).decode("utf-8"))
+    f.close()
+
+    # ai: _Element = ai_tag.makeelement(_tag="speed")
+
+
 def main():
     print("parameters: ")
     for i in range(1, len(sys.argv)):
@@ -43,62 +80,29 @@ def main():
     working_directory = "C:\\sbse4tac-ws-2019-self-driving-car-e2edriving"
     """
 
-    service = AIExchangeService("localhost", 8383)
+    # Add an entry for every running SimNode, the tests are spread over all of them.
+    endpoints = [("localhost", 8383)]
+    pool = SimulatorPool.from_endpoints(endpoints)
 
     vid = VehicleID()
     vid.vid = "ego"
 
-    tg = TestGenerator()
+    # The roads are created in a background thread, so they are plotted into files instead of windows.
+    tg = TestGenerator(renderer=PlotRenderer("plots"))
     tg.set_difficulty("easy")
-    while True:
-        for paths in tg.getTest():
-            criteria = paths[1]
-            environment = paths[0]
-
-            # edit the xml
-            spec = importlib.util.spec_from_file_location("AI",
-                                                          data_request_path)
-            foo = importlib.util.module_from_spec(spec)
-            # Actually run the import
-            spec.loader.exec_module(foo)
-
-            # get ai element
-            double_backslash_dbc_path = str(criteria).replace("\\", "\\" + "\\")
-            tree = parse(double_backslash_dbc_path)
-            root = tree.getroot()
-            for i in range(0, len(root.getchildren())):
-                if root.getchildren()[i].tag == "{http://drivebuild.com}participants":
-                    participant_block = root.getchildren()[i].getchildren()[0]
-                    for j in range(0, len(participant_block)):
-                        part_child = participant_block.getchildren()[j]
-                        if part_child.tag == "{http://drivebuild.com}ai":
-                            pass
-                            part_child.clear()
-                            foo.add_data_requests(part_child, "ego")
-                            pass
-            # write the changed xml
-            # TODO pretty print
-            f = open(double_backslash_dbc_path, "w")
-            f.write(tostring(root, pretty_print=True).decode("utf-8"))
-            f.close()
-
-            # ai: _Element = ai_tag.makeelement(_tag="speed")
-
-            submission_result = service.run_tests("test", "test", environment, criteria)
-            # Interact with a simulation
-            if submission_result and submission_result.submissions:
-                for test_name, sid in submission_result.submissions.items():
-                    ai_process = subprocess.Popen([env_path, ai_path, sid.sid], cwd=working_directory)
-
-                    sim_state = service.wait_for_simulator_request(sid, vid)
-                    while sim_state is SimStateResponse.SimState.RUNNING:
-                        sleep(5)
-                        sim_state = service.wait_for_simulator_request(sid, vid)
-
-                    # TODO Use a trap or try except to ensure we kill the process
-                    kill_process(ai_process)
-                    sleep(5)
-                    tg.onTestFinished(sid, vid)
+
+    def start_ai(sid):
+        return subprocess.Popen([env_path, ai_path, sid.sid], cwd=working_directory)
+
+    def stop_ai(ai_process):
+        kill_process(ai_process)
+
+    # The next generation is created while the current one is simulated.
+    pipeline = SimulationPipeline(tg, pool, vid,
+                                  prepare_test=lambda environment, criteria: add_data_requests(criteria,
+                                                                                               data_request_path),
+                                  start_ai=start_ai, stop_ai=stop_ai)
+    pipeline.run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,200 @@
+"""Measures the memory allocated per generation of the genetic algorithm. Run it from the root of the repository:
+
+    python -m benchmarks.allocations --difficulty hard --generations 5
+
+Python has no portable counter for cumulative allocations, so tracemalloc reports the peak and the retained memory
+of the offspring production of every generation. Each generation is bred twice from the same parents: with the
+copy-on-write Individuals of the genetic algorithm, and, as baseline, with the deepcopies which the genetic algorithm
+used to do (both parents per crossover iteration, again in the recombination, the control points per mutation try
+and the whole population before splining). The population is carried over from one generation to the next. Without
+simulation the fitness of the new roads is estimated by the SurrogateModel, so the elites change like in a real run.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+from copy import deepcopy
+
+from test_generator import TestGenerator
+from utils.surrogate import SurrogateModel
+from utils.validity_checks import *
+
+
+def _traced(function):
+    """Runs a function while tracing memory allocations.
+    :param function: Function without parameters.
+    :return: Tuple of the return value, peak and retained bytes.
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, current
+
+
+def _as_dict(individual):
+    """Returns an individual in the dict representation which the genetic algorithm used before Individual.
+    :param individual: Individual of the population.
+    :return: Dict with the control points as list of dicts.
+    """
+    return {"control_points": individual.control_points, "file_name": individual.file_name,
+            "fitness": individual.fitness}
+
+
+def _valid_child(generator, child):
+    """Checks a child of the deepcopy crossover like _crossover does.
+    :param generator: TestGenerator.
+    :param child: Individual in dict form.
+    :return: {@code True} if the child is valid.
+    """
+    points = as_point_array(child["control_points"])
+    spline_list = generator._bspline(points)
+    return not (intersection_check_all(points)
+                or intersection_check_width(generator._get_width_lines(spline_list), points_to_segments(spline_list)))
+
+
+def _deepcopy_recombination(parent1, parent2, separation_index):
+    """Recombination of the old genetic algorithm, which deepcopies both parents.
+    :param parent1: First parent in dict form.
+    :param parent2: Second parent in dict form.
+    :param separation_index: Point where the crossover should happen.
+    :return: List of the two children.
+    """
+    child1 = deepcopy(parent1)
+    child1["control_points"] = (parent1["control_points"][:separation_index + 1]
+                                + parent2["control_points"][separation_index + 1:])
+    child2 = deepcopy(parent2)
+    child2["control_points"] = (parent2["control_points"][:separation_index + 1]
+                                + parent1["control_points"][separation_index + 1:])
+    return [child1, child2]
+
+
+def _deepcopy_crossover(generator, parent1, parent2):
+    """Crossover of the old genetic algorithm, which deepcopies both parents on every iteration.
+    :param generator: TestGenerator.
+    :param parent1: First parent in dict form.
+    :param parent2: Second parent in dict form.
+    :return: List of the two children.
+    """
+    probability = 0.25
+    smaller_index = min(len(parent1["control_points"]), len(parent2["control_points"]))
+    iterator = 1
+    tries = 0
+    while tries < generator.MAX_TRIES / 5:
+        while iterator < smaller_index:
+            child1 = deepcopy(parent1)
+            child2 = deepcopy(parent2)
+            if generator.rng.random() <= probability:
+                child1, child2 = _deepcopy_recombination(child1, child2, iterator)
+                if _valid_child(generator, child1) and _valid_child(generator, child2):
+                    return [child1, child2]
+            iterator += 1
+        tries += 1
+    return [parent1, parent2]
+
+
+def _deepcopy_mutation(generator, individual):
+    """Mutation of the old genetic algorithm, which deepcopies the control points on every try.
+    :param generator: TestGenerator.
+    :param individual: Individual in dict form.
+    :return: Mutated individual.
+    """
+    probability = 0.25
+    control_points = individual["control_points"]
+    iterator = 2
+    while iterator < len(control_points):
+        if generator.rng.random() <= probability:
+            valid = False
+            tries = 0
+            while not valid and tries < generator.MAX_TRIES / 10:
+                tries += 1
+                candidates = generator._generate_random_points_batch(
+                    (control_points[iterator - 1]["x"], control_points[iterator - 1]["y"]),
+                    (control_points[iterator - 2]["x"], control_points[iterator - 2]["y"]), 1)
+                if len(candidates) == 0:
+                    continue
+                temp_list = deepcopy(control_points)
+                temp_list[iterator] = {"x": float(candidates[0][0]), "y": float(candidates[0][1])}
+                spline_list = generator._bspline(temp_list, 60)
+                if not (intersection_check_all_np(spline_list)
+                        or intersection_check_width(generator._get_width_lines(spline_list),
+                                                    points_to_segments(spline_list))):
+                    valid = True
+                    control_points[iterator] = temp_list[iterator]
+        iterator += 1
+    individual["fitness"] = 0
+    return individual
+
+
+def _deepcopy_offspring(generator, population):
+    """Offspring production of the old genetic algorithm, including the deepcopy of the population before splining.
+    :param generator: TestGenerator.
+    :param population: List of individuals in dict form, it is filled up to POPULATION_SIZE.
+    :return: Copy of the population.
+    """
+    while len(population) < generator.POPULATION_SIZE:
+        selected_indices = generator.rng.choice(len(population), 2, replace=False)
+        children = _deepcopy_crossover(generator, population[selected_indices[0]], population[selected_indices[1]])
+        population.append(_deepcopy_mutation(generator, children[0]))
+        population.append(_deepcopy_mutation(generator, children[1]))
+    return deepcopy(population)
+
+
+def measure(difficulty="hard", generations=5, seed=0):
+    """Runs the offspring production of several generations and measures its allocations.
+    :param difficulty: Difficulty of the test generator.
+    :param generations: Number of measured generations.
+    :param seed: Seed of the random number generators.
+    :return: List of dicts with the measurements of each generation.
+    """
+    generator = TestGenerator(difficulty, seed=seed)
+    baseline = TestGenerator(difficulty, seed=seed)
+    surrogate = SurrogateModel()
+    results = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        generator.population_list = generator._create_start_population()[:generator.NUMBER_ELITES]
+        for generation in range(generations):
+            parents = [_as_dict(individual) for individual in generator.population_list]
+            start = time.perf_counter()
+            _, breed_peak, breed_retained = _traced(generator._produce_offspring)
+            seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            _, deepcopy_peak, deepcopy_retained = _traced(lambda: _deepcopy_offspring(baseline, parents))
+            deepcopy_seconds = time.perf_counter() - start
+            results.append({"generation": generation,
+                            "difficulty": difficulty,
+                            "population_size": len(generator.population_list),
+                            "offspring_peak_bytes": breed_peak,
+                            "offspring_retained_bytes": breed_retained,
+                            "seconds": seconds,
+                            "deepcopy_offspring_peak_bytes": deepcopy_peak,
+                            "deepcopy_offspring_retained_bytes": deepcopy_retained,
+                            "deepcopy_seconds": deepcopy_seconds})
+
+            # Next generation: the estimated fitness stands in for the simulation.
+            estimates = surrogate.predict([generator._get_spline(individual, 75)
+                                           for individual in generator.population_list], generator.WIDTH_OF_STREET)
+            for individual, estimate in zip(generator.population_list, estimates):
+                individual.fitness = float(estimate)
+                individual.metrics = {}
+            generator.population_list = generator._choose_elite(generator.population_list)
+            generator._add_newcomer()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--difficulty", default="hard", choices=["easy", "medium", "hard"])
+    parser.add_argument("--generations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(measure(args.difficulty, args.generations, args.seed), indent=4))
+
+
+if __name__ == '__main__':
+    main()
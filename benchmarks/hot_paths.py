@@ -0,0 +1,155 @@
+"""Measures the run time of the road generation hot paths. Run it from the root of the repository:
+
+    python -m benchmarks.hot_paths --output before.json
+    python -m benchmarks.hot_paths --output after.json --compare before.json
+
+Every difficulty has a fixed seed, so every run measures the same roads. The road functions are measured with
+roads of several lengths (prefixes of generated roads) and several numbers of spline samples. All times are in
+seconds per call for ROADS roads (for _generate_random_points: one road). Neither DriveBuild nor BeamNG is needed,
+plots are not shown.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import time
+import timeit
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+from test_generator import TestGenerator
+from utils.individual import Individual
+from utils.validity_checks import *
+
+SEEDS = {"easy": 1, "medium": 2, "hard": 3}
+SAMPLES = (60, 75, 100, 125)
+ROADS = 4
+
+
+def _time(function, repeat):
+    """Measures the run time of a function. Fast functions are called several times per measurement.
+    :param function: Function without parameters.
+    :param repeat: Number of measurements.
+    :return: Dict with the best and the median seconds per call and the number of calls per measurement.
+    """
+    timer = timeit.Timer(function)
+    number = timer.autorange()[0]
+    times = [seconds / number for seconds in timer.repeat(repeat, number)]
+    return {"best": min(times), "median": statistics.median(times), "calls": number}
+
+
+def _road_lengths(generator):
+    """Returns the measured road lengths of a difficulty.
+    :param generator: TestGenerator with the difficulty.
+    :return: Sorted list of numbers of control points.
+    """
+    return sorted({generator.MIN_NODES, (generator.MIN_NODES + generator.MAX_NODES) // 2, generator.MAX_NODES})
+
+
+def measure(difficulty, repeat=5):
+    """Measures the hot paths of one difficulty.
+    :param difficulty: Difficulty of the test generator.
+    :param repeat: Number of measurements of each function.
+    :return: List of dicts with the name, the parameters and the run time of each measured function.
+    """
+    generator = TestGenerator(difficulty, seed=SEEDS[difficulty])
+    results = []
+
+    def add(name, function, nodes=None, samples=None, times=repeat):
+        generator.rng = np.random.default_rng(SEEDS[difficulty])
+        result = {"name": name, "difficulty": difficulty, "nodes": nodes, "samples": samples}
+        result.update(_time(function, times))
+        results.append(result)
+
+    # Generating a whole road takes long, so it is measured less often.
+    add("_generate_random_points", generator._generate_random_points, times=max(1, repeat // 2))
+    roads = []
+    while len(roads) < ROADS:
+        points = generator._generate_random_points()
+        if points is not None and len(points) == generator.MAX_NODES:
+            roads.append(points)
+
+    individuals = [Individual(points) for points in roads]
+    add("_mutation", lambda: [generator._mutation(individual.copy()) for individual in individuals])
+    add("_crossover", lambda: [generator._crossover(individuals[i].copy(), individuals[i + 1].copy())
+                               for i in range(0, len(individuals) - 1, 2)])
+
+    candidates = generator._generate_random_points_batch(roads[0][-1], roads[0][-2], generator.CANDIDATES_PER_BATCH)
+    for nodes in _road_lengths(generator):
+        prefixes = [points[:nodes] for points in roads]
+        add("intersection_check_all", lambda: [intersection_check_all(points) for points in prefixes], nodes)
+        add("intersection_check_last", lambda: [intersection_check_last(points[:-1], points[-1])
+                                                for points in prefixes], nodes)
+        add("intersection_check_last_batch", lambda: [intersection_check_last_batch(points, candidates)
+                                                      for points in prefixes], nodes)
+        for samples in SAMPLES:
+            add("_bspline", lambda: [generator._bspline(points, samples) for points in prefixes], nodes, samples)
+            splines = [generator._bspline(points, samples) for points in prefixes]
+            width_lines = [generator._get_width_lines(spline) for spline in splines]
+            segments = [points_to_segments(spline) for spline in splines]
+            add("_get_width_lines", lambda: [generator._get_width_lines(spline) for spline in splines], nodes,
+                samples)
+            add("intersection_check_all_np", lambda: [intersection_check_all_np(spline) for spline in splines],
+                nodes, samples)
+            add("spline_intersection_check", lambda: [spline_intersection_check(spline) for spline in splines],
+                nodes, samples)
+            add("intersection_check_width", lambda: [intersection_check_width(width, segment)
+                                                     for width, segment in zip(width_lines, segments)],
+                nodes, samples)
+    return results
+
+
+def compare(results, baseline):
+    """Compares the median run times with an earlier run.
+    :param results: List of results of this run.
+    :param baseline: List of results of the earlier run.
+    :return: List of dicts with the parameters and the ratio of the median run times (> 1 means slower).
+    """
+    def key(result):
+        return result["name"], result["difficulty"], result["nodes"], result["samples"]
+
+    old = {key(result): result for result in baseline}
+    ratios = []
+    for result in results:
+        before = old.get(key(result))
+        if before is not None and before["median"] > 0:
+            ratios.append({"name": result["name"], "difficulty": result["difficulty"], "nodes": result["nodes"],
+                           "samples": result["samples"], "ratio": result["median"] / before["median"]})
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--difficulty", nargs="+", default=list(SEEDS), choices=list(SEEDS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Writes the results into this file instead of printing them.")
+    parser.add_argument("--compare", help="Results of an earlier run, prints the ratios of the run times.")
+    args = parser.parse_args()
+
+    results = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for difficulty in args.difficulty:
+            results.extend(measure(difficulty, args.repeat))
+    report = {"python": platform.python_version(),
+              "numpy": np.__version__,
+              "machine": platform.machine(),
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "results": results}
+    if args.output is None:
+        print(json.dumps(report, indent=4))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+        print(json.dumps(compare(results, baseline), indent=4))
+
+
+if __name__ == '__main__':
+    main()
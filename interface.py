@@ -11,4 +11,4 @@ if __name__ == '__main__':
             dbc = paths[1]
             # convert_test(dbc, dbe)        # Use this function only when DriveBuild doesn't work for you.
             # All your code goes here
-            # Be sure to call onTestFinished(sid, vid)
+            # Be sure to call onTestSubmitted(test_name, sid) for every submission and onTestFinished(sid, vid)
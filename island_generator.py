@@ -0,0 +1,230 @@
+"""This file offers the island model of the test generator. Several populations (islands) evolve in their own
+  processes and exchange their best roads with the next island in a ring every few generations. A coordinator collects
+  the populations of all islands and creates the test files of them.
+"""
+
+import multiprocessing
+import traceback
+from copy import copy
+from queue import Empty
+from time import monotonic, perf_counter
+
+import numpy as np
+from termcolor import colored
+
+from test_generator import TestGenerator
+
+
+def _island(generator, seed, commands, results, inbox, outbox, migration_interval, migrants, migration_timeout):
+    """Main loop of an island process. Every command contains the fitness values of the population which the island
+     returned the last time, and the island answers with its next population.
+    :param generator: TestGenerator with the settings of the island.
+    :param seed: SeedSequence of the island.
+    :param commands: Queue with the commands of the coordinator, None stops the island.
+    :param results: Queue for the populations of the island.
+    :param inbox: Queue with migrants of the previous island.
+    :param outbox: Queue for migrants to the next island.
+    :param migration_interval: Number of generations between two migrations.
+    :param migrants: Number of best individuals which are sent to the next island.
+    :param migration_timeout: Seconds to wait for migrants before the island continues without them.
+    :return: Void.
+    """
+    generator.seed_sequence = seed
+    generator.rng = np.random.default_rng(seed.spawn(1)[0])
+    generator.workers = None
+    generation = 0
+    while True:
+        command = commands.get()
+        if command is None:
+            return
+        fitness, metrics, estimates, seeded = command
+        try:
+            if len(generator.population_list) == 0:
+                generator.population_list = generator._create_start_population(seeded)
+            else:
+                for individual, value, trace, estimate in zip(generator.population_list, fitness, metrics, estimates):
+                    individual.fitness = value
+                    individual.metrics = trace
+                    individual.estimate = estimate
+                generator.population_list = generator._choose_elite(generator.population_list)
+                generation += 1
+                if migrants > 0 and generation % migration_interval == 0:
+                    _migrate(generator, generation, inbox, outbox, migrants, migration_timeout)
+                generator._add_newcomer()
+            generator._produce_offspring()
+            generator._update_acceptance()
+            results.put(("population", generator.population_list, generator.instrumentation))
+            generator.instrumentation = generator.instrumentation.child()
+        except Exception:
+            results.put(("error", traceback.format_exc(), None))
+
+
+def _migrate(generator, generation, inbox, outbox, migrants, timeout):
+    """Sends the best individuals of an island to the next island and replaces the worst elites with the individuals
+     of the previous island. Every batch of migrants is tagged with its generation, so a batch which arrives after the
+     timeout is dropped in the next migration instead of being used in place of the current batch.
+    :param generator: TestGenerator of the island, its population must only contain the elites.
+    :param generation: Current generation of the island.
+    :param inbox: Queue with migrants of the previous island.
+    :param outbox: Queue for migrants to the next island.
+    :param migrants: Number of sent individuals.
+    :param timeout: Seconds to wait for the migrants of the previous island.
+    :return: Void.
+    """
+    outbox.put((generation, [individual.copy() for individual in generator.population_list[:migrants]]))
+    deadline = monotonic() + timeout
+    while True:
+        try:
+            sent, arrived = inbox.get(timeout=max(0, deadline - monotonic()))
+        except Empty:
+            print(colored("No migrants arrived, continuing without them.", "blue"))
+            return
+        if sent == generation:
+            break
+        print(colored("Dropped late migrants of generation {}.".format(sent), "blue"))
+    if len(arrived) > 0:
+        generator.population_list[-len(arrived):] = arrived
+
+
+class IslandTestGenerator(TestGenerator):
+    """Test generator with several populations which evolve in parallel processes. Every island has POPULATION_SIZE
+     individuals, so every generation has islands * POPULATION_SIZE tests. The results are the same for the same seed,
+     as long as no island continues without migrants because of the migration timeout.
+    """
+
+    def __init__(self, difficulty="Easy", islands=4, seed=None, migration_interval=2, migrants=1,
+                 migration_timeout=60, **kwargs):
+        """
+        :param difficulty: Difficulty of the roads, see TestGenerator.
+        :param islands: Number of islands (processes).
+        :param seed: Seed of the random number generators of all islands.
+        :param migration_interval: Number of generations between two migrations.
+        :param migrants: Number of best individuals which every island sends to the next one, at most NUMBER_ELITES.
+        :param migration_timeout: Seconds an island waits for migrants before it continues without them.
+        :param kwargs: Further parameters of TestGenerator, e.g. cache, store or renderer. The islands only breed,
+                       the test files are created and the results are recorded by the coordinator.
+        """
+        super().__init__(difficulty, seed=seed, **kwargs)
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migrants = min(migrants, self.NUMBER_ELITES)
+        self.migration_timeout = migration_timeout
+        self._processes = []
+        self._commands = []
+        self._results = []
+        self._migrations = []
+        self._sizes = []                    # Number of individuals of every island in population_list
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_processes"] = []
+        state["_commands"] = []
+        state["_results"] = []
+        state["_migrations"] = []
+        state["_sizes"] = []
+        return state
+
+    def _start_islands(self):
+        """Starts the island processes. Island i sends its migrants to island i + 1, the last one to the first one.
+        :return: Void.
+        """
+        context = multiprocessing.get_context()
+        # The parent keeps the queues, they would be removed before a spawned island can open them otherwise.
+        self._migrations = [context.Queue() for _ in range(self.islands)]
+        migrations = self._migrations
+        # The copy leaves out everything an island does not need (or cannot use), e.g. the cache and the store.
+        settings = copy(self)
+        for index, seed in enumerate(self.seed_sequence.spawn(self.islands)):
+            commands = context.Queue()
+            results = context.Queue()
+            process = context.Process(target=_island, name="Island{}".format(index), daemon=True,
+                                      args=(settings, seed, commands, results, migrations[index],
+                                            migrations[(index + 1) % self.islands], self.migration_interval,
+                                            self.migrants, self.migration_timeout))
+            process.start()
+            self._processes.append(process)
+            self._commands.append(commands)
+            self._results.append(results)
+
+    def _receive(self, index):
+        """Waits for the next population of an island.
+        :param index: Index of the island.
+        :return: List of individuals.
+        """
+        while True:
+            try:
+                kind, value, instrumentation = self._results[index].get(timeout=1)
+                break
+            except Empty:
+                if not self._processes[index].is_alive():
+                    raise RuntimeError("Island {} stopped unexpectedly.".format(index))
+        if kind == "error":
+            raise RuntimeError("Island {} failed:\n{}".format(index, value))
+        self.instrumentation.merge(instrumentation)
+        return value
+
+    def genetic_algorithm(self):
+        """Runs one generation on all islands and creates the test files of all populations.
+        :return: Void. But it creates xml files.
+        """
+        start = perf_counter()
+        seeded = [[] for _ in range(self.islands)]
+        if len(self._processes) == 0:
+            self._start_islands()
+            for index, individual in enumerate(self._stored_population()):
+                seeded[index % self.islands].append(individual)
+
+        # Every island gets the fitness values of its part of the population.
+        offset = 0
+        for index, commands in enumerate(self._commands):
+            population = self.population_list[offset:offset + self._sizes[index]] if self._sizes else []
+            offset += len(population)
+            with self.lock:
+                command = ([individual.fitness for individual in population],
+                           [individual.metrics for individual in population],
+                           [individual.estimate for individual in population], seeded[index])
+            commands.put(command)
+        with self.instrumentation.timer("islands"):
+            try:
+                populations = [self._receive(index) for index in range(self.islands)]
+            except Exception:
+                # The populations of the other islands would be paired with the fitness values of the wrong
+                # generation in the next call, so all islands start again.
+                self._stop_islands()
+                raise
+        self._sizes = [len(population) for population in populations]
+        self.population_list = [individual for population in populations for individual in population]
+        for individual in self.population_list:
+            individual.file_name = self.files_name
+
+        print(colored("Population finished.", "blue"))
+        self._publish_population()
+        self.instrumentation.count("generations")
+        self.instrumentation.add_time("generation", perf_counter() - start)
+        self.instrumentation.dump()
+
+    def _stop_islands(self):
+        """Stops the island processes and drops their populations. The islands are started again (with new
+         populations) when they are needed.
+        :return: Void.
+        """
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._commands = []
+        self._results = []
+        self._migrations = []
+        self._sizes = []
+        self.population_list = []
+
+    def close(self):
+        """Stops the island processes, the worker processes and the renderer. The islands are started again (with new
+         populations) when they are needed.
+        :return: Void.
+        """
+        self._stop_islands()
+        super().close()
@@ -1,22 +1,26 @@
-from glob import glob
-from os import path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from math import ceil, log, log1p
 from pathlib import Path
-from random import randint, random, sample
-from copy import deepcopy
+from threading import Lock, current_thread, main_thread
+from time import perf_counter
 from typing import Optional, Tuple
 
 from drivebuildclient.AIExchangeService import AIExchangeService
 from termcolor import colored
-from utils.xml_creator import build_all_xml
+from utils.files import write_files
+from utils.scenario_cache import scenario_key
+from utils.xml_creator import render_xml
+from utils.bspline import bspline, bspline_batch
+from utils.individual import Individual
+from utils.instrumentation import Instrumentation
 from utils.plotter import plot_all
+from utils.road_builder import RoadBuilder
+from utils.trace import TraceBuffer
 from utils.validity_checks import *
-from utils.utility_functions import convert_points_to_lines
 
-from shapely.geometry import LineString
-from shapely import affinity
 import numpy as np
-import scipy.interpolate as si
-from math import degrees, atan2
 
 MIN_DEGREES = 70
 MAX_DEGREES = 290
@@ -51,28 +55,76 @@ def _add_ego_car(individual):
 
 
 def get_angle(a, b, c):
-    """Returns the angle between three points (two lines so to say).
+    """Returns the angle between three points (two lines so to say). Works also with arrays of points.
     :param a: First point.
     :param b: Second point.
     :param c: Third point.
     :return: Angle in degrees.
     """
-    ang = degrees(atan2(c[1] - b[1], c[0] - b[0]) - atan2(a[1] - b[1], a[0] - b[0]))
-    return ang + 360 if ang < 0 else ang
+    a, b, c = np.asarray(a), np.asarray(b), np.asarray(c)
+    ang = np.degrees(np.arctan2(c[..., 1] - b[..., 1], c[..., 0] - b[..., 0])
+                     - np.arctan2(a[..., 1] - b[..., 1], a[..., 0] - b[..., 0]))
+    return np.where(ang < 0, ang + 360, ang)
+
+
+def _generate_road(generator, seed):
+    """Tries to generate the control points of one road with its own random number generator. This is the task of
+     the worker processes, but it is also used when no worker processes are used.
+    :param generator: TestGenerator with the settings of the road.
+    :param seed: Seed (e.g. a SeedSequence) of the random number generator.
+    :return: Tuple of the array of control points (None if no valid road was found), the instrumentation of the
+             task and the accepted and examined candidates.
+    """
+    generator = copy(generator)
+    generator.rng = np.random.default_rng(seed)
+    return generator._generate_random_points(), generator.instrumentation, generator.last_acceptance
+
+
+def _breed(generator, parent1, parent2, seed):
+    """Produces two children of two parents by crossover and mutation with its own random number generator. This is
+     the task of the worker processes, but it is also used when no worker processes are used.
+    :param generator: TestGenerator with the settings of the roads.
+    :param parent1: First parent.
+    :param parent2: Second parent.
+    :param seed: Seed (e.g. a SeedSequence) of the random number generator.
+    :return: Tuple of the list of two children and the instrumentation of the task.
+    """
+    generator = copy(generator)
+    generator.rng = np.random.default_rng(seed)
+    children = generator._crossover(parent1, parent2)
+    return [generator._mutation(children[0]), generator._mutation(children[1])], generator.instrumentation
 
 
 class TestGenerator:
     """This class generates roads using a genetic algorithm."""
 
-    def __init__(self, difficulty="Easy"):
+    def __init__(self, difficulty="Easy", workers=None, seed=None, cache=None, store=None, surrogate=None,
+                 instrumentation=None, renderer=None):
         """
         :param difficulty: Variable roads characteristics, depending on how
                            feasible the roads should be for the AI. Possible
                            options: easy, medium, hard
+        :param workers: Number of worker processes for the road generation. None or 1 generates everything in this
+                        process.
+        :param seed: Seed of the random number generators. The same seed leads to the same roads, no matter how many
+                     workers are used.
+        :param cache: Optional ScenarioCache. Roads which are in the cache are neither rendered nor simulated again.
+        :param store: Optional ResultStore. Roads which were simulated in an earlier run are not simulated again, and
+                      the start population begins with the best stored roads.
+        :param surrogate: Optional SurrogateModel. Only the new roads with the highest estimated fitness are
+                          simulated, the others only get an estimate and cannot become elites. The model is trained
+                          with the result store.
+        :param instrumentation: Optional Instrumentation which counts and times the steps of every generation.
+        :param renderer: Optional PlotRenderer which writes the roads of every generation into files in the
+                         background. Without renderer the roads are plotted in blocking windows.
         """
         self.files_name = "exampleTest"
         self.SPLINE_DEGREE = 5              # Sharpness of curves
         self.MAX_TRIES = 500                # Maximum number of invalid generated points/segments
+        self.MIN_TRIES = 50                 # Minimum retry budget for one node
+        self.MISS_PROBABILITY = 0.001       # Accepted chance to miss a findable node within the retry budget
+        self.BACKTRACK_NODES = 2            # Number of removed nodes when no valid next node is found
+        self.MAX_BACKTRACKS = 5             # Maximum number of backtracks for one road
         self.POPULATION_SIZE = 8            # Minimum number of generated roads for each generation
         self.NUMBER_ELITES = 4              # Number of best kept roads
         self.MIN_SEGMENT_LENGTH = 28        # Minimum length of a road segment
@@ -80,33 +132,119 @@ class TestGenerator:
         self.WIDTH_OF_STREET = 4            # Width of all segments
         self.MIN_NODES = 8                  # Minimum number of control points for each road
         self.MAX_NODES = 12                 # Maximum number of control points for each road
+        self.CANDIDATES_PER_BATCH = 16      # Number of random points which are drawn and checked at once
+        self.DISTANCE_THRESHOLD = 1         # Distance to the road center which counts as critical
+        self.acceptance = (0, 0)            # Accepted and examined candidates of all previous generations
+        self._new_acceptance = (0, 0)       # Accepted and examined candidates of the current generation
+        self.last_acceptance = (0, 0)       # Accepted and examined candidates of the last generated road
+        self.workers = workers
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence.spawn(1)[0])
         self.population_list = []
+        self._executor = None
+        self._service = None
+        self.cache = cache
+        self.store = store
+        self.surrogate = surrogate
+        self.renderer = renderer
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation(enabled=False)
+        self._trained_samples = 0           # Number of stored results the surrogate was trained with
+        self.generation = 0
+        self._tests = {}                    # Test name -> (generation, individual, cache key)
+        self._simulations = {}              # Simulation ID -> (generation, individual, cache key)
+        self._test_files = []               # Paths of the dbe and dbc files of the current generation
+        # Held while the fitness values, the tests of the simulations or the cache are read or changed, so the
+        # callbacks of DriveBuild can run in other threads while the next generation is created.
+        self.lock = Lock()
         self.set_difficulty(difficulty)
 
+    def __getstate__(self):
+        # Worker processes only need the settings, not the population or the process pool.
+        state = self.__dict__.copy()
+        state["population_list"] = []
+        state["_executor"] = None
+        state["_tests"] = {}
+        state["_simulations"] = {}
+        state["cache"] = None
+        state["store"] = None
+        state["renderer"] = None
+        state["lock"] = None
+        # Copies count on their own, the values are merged when the task is finished.
+        state["instrumentation"] = self.instrumentation.child()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def _get_executor(self):
+        """Returns the process pool of this generator and starts it on the first call.
+        :return: ProcessPoolExecutor or None if no worker processes should be used.
+        """
+        if self.workers is None or self.workers <= 1:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        """Shuts the worker processes and the renderer down. They are started again when they are needed.
+        :return: Void.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.renderer is not None:
+            self.renderer.close()
+
     def _bspline(self, control_points, samples=75):
         """Calculate {@code samples} samples on a bspline. This is the road representation function.
-        :param control_points: List of control points.
+        :param control_points: Array of control points with shape (N, 2) or list of dicts containing points.
         :param samples: Number of samples to return.
         :return: Array with samples, representing a bspline of the given function as a numpy array.
         """
-        point_list = []
-        for point in control_points:
-            point_list.append((point.get("x"), point.get("y")))
-        point_list = np.asarray(point_list)
-        count = len(point_list)
-        degree = np.clip(self.SPLINE_DEGREE, 1, count - 1)
+        self.instrumentation.count("spline_evaluations")
+        return bspline(as_point_array(control_points), self.SPLINE_DEGREE, samples)
+
+    def _samples_per_span(self):
+        """Returns the number of spline samples per knot span, so that a road with the maximum number of nodes
+        gets around 100 samples.
+        :return: Number of samples between two knots.
+        """
+        return int(np.ceil(100 / max(1, self.MAX_NODES - self.SPLINE_DEGREE)))
 
-        # Calculate knot vector.
-        kv = np.concatenate(([0] * degree, np.arange(count - degree + 1), [count - degree] * degree))
+    def _get_spline(self, individual, samples=75):
+        """Returns the spline samples of an individual. The result is cached by the individual.
+        :param individual: Individual of the population.
+        :param samples: Number of samples.
+        :return: Array of spline samples with shape (samples, 2).
+        """
+        return individual.cached(("spline", self.SPLINE_DEGREE, samples),
+                                 lambda points: self._bspline(points, samples))
 
-        # Calculate query range.
-        u = np.linspace(False, (count - degree), samples)
+    def _get_segments(self, individual, samples=75):
+        """Returns the segments between the spline samples of an individual. The result is cached by the individual.
+        :param individual: Individual of the population.
+        :param samples: Number of spline samples.
+        :return: Array of segments with shape (samples - 1, 2, 2).
+        """
+        return individual.cached(("segments", self.SPLINE_DEGREE, samples),
+                                 lambda points: points_to_segments(self._get_spline(individual, samples)))
 
-        # Calculate result.
-        return np.array(si.splev(u, (kv, point_list.T, degree))).T
+    def _get_individual_width_lines(self, individual, samples=75):
+        """Returns the width lines of the spline of an individual. The result is cached by the individual.
+        :param individual: Individual of the population.
+        :param samples: Number of spline samples.
+        :return: Array of width lines with shape (samples, 2, 2).
+        """
+        return individual.cached(("width_lines", self.SPLINE_DEGREE, self.WIDTH_OF_STREET, samples),
+                                 lambda points: self._get_width_lines(self._get_spline(individual, samples)))
 
     def set_difficulty(self, difficulty):
         difficulty = difficulty.upper()
+        # The acceptance rate of other settings says nothing about the new ones.
+        self.acceptance = (0, 0)
+        self._new_acceptance = (0, 0)
         if difficulty == "EASY":
             self.SPLINE_DEGREE = 7
             self.MIN_SEGMENT_LENGTH = 30
@@ -131,81 +269,170 @@ class TestGenerator:
         else:
             print(colored("Invalid difficulty level. Choosing default difficulty.", 'blue'))
 
-    def _generate_random_point(self, last_point, penultimate_point):
-        """Generates a random point within a given range.
-        :param last_point: Last point of the control point list as dict type.
-        :param penultimate_point: Point before the last point as dict type.
-        :return: A new random point as dict type.
-        """
-        last_point_tmp = (last_point.get("x"), last_point.get("y"))
-        last_point_tmp = np.asarray(last_point_tmp)
-        x_min = last_point.get("x") - self.MAX_SEGMENT_LENGTH
-        x_max = last_point.get("x") + self.MAX_SEGMENT_LENGTH
-        y_min = last_point.get("y") - self.MAX_SEGMENT_LENGTH
-        y_max = last_point.get("y") + self.MAX_SEGMENT_LENGTH
-        tries = 0
-        while tries < self.MAX_TRIES / 5:
-            x_pos = randint(x_min, x_max)
-            y_pos = randint(y_min, y_max)
-            point = (x_pos, y_pos)
-            deg = get_angle((penultimate_point.get("x"), penultimate_point.get("y")),
-                            (last_point.get("x"), last_point.get("y")),
-                            point)
-            dist = np.linalg.norm(np.asarray(point) - last_point_tmp)
-            if (self.MAX_SEGMENT_LENGTH >= dist >= self.MIN_SEGMENT_LENGTH) and (MIN_DEGREES <= deg <= MAX_DEGREES):
-                return {"x": point[0], "y": point[1]}
-            tries += 1
+    def _generate_random_points_batch(self, last_point, penultimate_point, count):
+        """Generates random points which have a valid distance and angle to the last two points. The points are drawn
+         uniformly from the ring between MIN_SEGMENT_LENGTH and MAX_SEGMENT_LENGTH around the last point, restricted
+         to the angles between MIN_DEGREES and MAX_DEGREES, so (almost) no point has to be rejected.
+        :param last_point: Last point of the control point list as (x, y) pair.
+        :param penultimate_point: Point before the last point as (x, y) pair.
+        :param count: Number of drawn points.
+        :return: Array of valid points with shape (K, 2), K <= count.
+        """
+        last_point = np.asarray(last_point, dtype=float)
+        penultimate_point = np.asarray(penultimate_point, dtype=float)
+        direction = np.arctan2(*(penultimate_point - last_point)[::-1])
+        radius = np.sqrt(self.rng.uniform(self.MIN_SEGMENT_LENGTH ** 2, self.MAX_SEGMENT_LENGTH ** 2, count))
+        angle = direction + np.radians(self.rng.uniform(MIN_DEGREES, MAX_DEGREES, count))
+        points = np.rint(last_point + radius[:, np.newaxis] * np.stack((np.cos(angle), np.sin(angle)), axis=1))
+
+        # Rounding to whole numbers can move a point out of the valid area.
+        dist = np.linalg.norm(points - last_point, axis=1)
+        deg = get_angle(penultimate_point, last_point, points)
+        valid = ((self.MAX_SEGMENT_LENGTH >= dist) & (dist >= self.MIN_SEGMENT_LENGTH)
+                 & (MIN_DEGREES <= deg) & (deg <= MAX_DEGREES))
+        return points[valid]
+
+    def _retry_budget(self, accepted, examined):
+        """Returns the number of candidates which are checked before the generation of a road backtracks. The budget
+         is chosen so that a node which can be found with the observed acceptance rate is missed only with the
+         probability MISS_PROBABILITY.
+        :param accepted: Number of accepted candidates of this road.
+        :param examined: Number of examined candidates of this road.
+        :return: Number of candidates between MIN_TRIES and MAX_TRIES.
+        """
+        # Beta(1, 1) prior, so the rate is never 0 or 1.
+        rate = (self.acceptance[0] + accepted + 1) / (self.acceptance[1] + examined + 2)
+        budget = ceil(log(self.MISS_PROBABILITY) / log1p(-rate))
+        return min(self.MAX_TRIES, max(self.MIN_TRIES, budget))
 
     def _generate_random_points(self):
-        """Generates random valid points and returns when the list is full or
-        the number of invalid nodes equals the number of maximum tries.
-        :return: Array of valid control points.
+        """Generates random valid points and returns when the list is full. If no valid next point is found within
+         the retry budget, the last BACKTRACK_NODES points are removed and the generation continues from there, at
+         most MAX_BACKTRACKS times. The number of accepted and examined candidates is stored in last_acceptance.
+        :return: Array of valid control points with shape (N, 2) or None if the road has not enough nodes.
         """
 
         # Generating the first two points by myself.
-        p0 = {"x": 1,
-              "y": 0}
-        p1 = {"x": 65,
-              "y": 0}
-        control_points = [p0, p1]
+        p0 = (1, 0)
+        p1 = (65, 0)
+        road = RoadBuilder([p0, p1], self.SPLINE_DEGREE, self._get_width_lines, self._samples_per_span(),
+                           lambda: self.instrumentation.count("spline_evaluations"))
+        self.instrumentation.count("road_attempts")
+        longest = road.points
+        accepted = 0
+        examined = 0
+        backtracks = 0
         tries = 0
-        while len(control_points) != self.MAX_NODES and tries <= self.MAX_TRIES:
-            new_point = self._generate_random_point(control_points[-1], control_points[-2])
-            temp_list = deepcopy(control_points)
-            temp_list.append(new_point)
-            spline_list = self._bspline(temp_list, 100)
-            control_points_lines = convert_points_to_lines(spline_list)
-            width_list = self._get_width_lines(spline_list)
-            if not (intersection_check_last(control_points, new_point) or spline_intersection_check(spline_list)
-                    or intersection_check_width(width_list, control_points_lines)):
-                control_points.append(new_point)
+        budget = self._retry_budget(accepted, examined)
+        while len(road) != self.MAX_NODES:
+            if tries > budget:
+                if len(road) > len(longest):
+                    longest = road.points
+                if backtracks == self.MAX_BACKTRACKS or len(road) == 2:
+                    break
+                for _ in range(min(self.BACKTRACK_NODES, len(road) - 2)):
+                    road.pop()
+                backtracks += 1
+                self.instrumentation.count("backtracks")
                 tries = 0
-            else:
+            candidates = self._generate_random_points_batch(road.points[-1], road.points[-2],
+                                                            self.CANDIDATES_PER_BATCH)
+            # Cheap check of the whole batch first, only the survivors are checked one after another.
+            rejected = intersection_check_last_batch(road.points, candidates)
+            tries += self.CANDIDATES_PER_BATCH - len(candidates)
+            examined += self.CANDIDATES_PER_BATCH - len(candidates)
+            self.instrumentation.count("rejected_sampling", self.CANDIDATES_PER_BATCH - len(candidates))
+            for candidate, invalid in zip(candidates, rejected):
+                if tries > budget:
+                    break
+                examined += 1
+                if invalid:
+                    self.instrumentation.count("rejected_intersection_check_last")
+                elif road.try_append(candidate):
+                    accepted += 1
+                    tries = 0
+                    budget = self._retry_budget(accepted, examined)
+                    break
+                else:
+                    self.instrumentation.count("rejected_" + road.rejection)
                 tries += 1
+        self.last_acceptance = (accepted, examined)
 
+        control_points = road.points if len(road) >= len(longest) else longest
         spline_list = self._bspline(control_points, 100)
         if spline_intersection_check(spline_list):
-            control_points.pop()
-        if len(control_points) < self.MIN_NODES or intersection_check_all_np(spline_list):
+            self.instrumentation.count("rejected_spline_intersection_check")
+            control_points = control_points[:-1]
+        # The road builder checks the width at a lower sample density, so the final check repeats it.
+        if (len(control_points) < self.MIN_NODES or intersection_check_all_np(spline_list)
+                or intersection_check_width(self._get_width_lines(spline_list), points_to_segments(spline_list))):
             print(colored("Couldn't create enough valid nodes. Restarting...", "blue"))
+            self.instrumentation.count("roads_failed")
         else:
             print(colored("Finished list!", "blue"))
             return control_points
 
-    def _create_start_population(self):
-        """Creates and returns an initial population."""
-        startpop = []
-        iterator = 0
+    def _update_acceptance(self):
+        """Adds the acceptance of the current generation to the acceptance which the retry budgets use.
+        :return: Void.
+        """
+        self.acceptance = (self.acceptance[0] + self._new_acceptance[0],
+                           self.acceptance[1] + self._new_acceptance[1])
+        self._new_acceptance = (0, 0)
+
+    def _record_acceptance(self, acceptance):
+        """Remembers the acceptance of a generated road. The retry budgets use it from the next generation on, so
+         the roads of one generation do not depend on the order in which they are generated.
+        :param acceptance: Tuple of the accepted and examined candidates.
+        :return: Void.
+        """
+        self._new_acceptance = (self._new_acceptance[0] + acceptance[0], self._new_acceptance[1] + acceptance[1])
+
+    def _create_start_population(self, seeded=None):
+        """Creates and returns an initial population. Every try to generate a road gets its own seed, and the results
+         are taken in the order of the tries, so the population only depends on the seed and not on the number of
+         workers or on which worker finishes first. Failed tries are replaced by new ones.
+        :param seeded: Individuals the population starts with, defaults to the best roads of the result store.
+        """
+        seeds = self.seed_sequence.spawn(1)[0]
+        executor = self._get_executor()
+        startpop = self._stored_population() if seeded is None else list(seeded)
+        if executor is None:
+            while len(startpop) < self.POPULATION_SIZE:
+                point_list, instrumentation, acceptance = _generate_road(self, seeds.spawn(1)[0])
+                self.instrumentation.merge(instrumentation)
+                self._record_acceptance(acceptance)
+                if point_list is not None:
+                    startpop.append(Individual(point_list, self.files_name))
+            return startpop
+
+        pending = deque()
         while len(startpop) < self.POPULATION_SIZE:
-            point_list = self._generate_random_points()
+            # Keep all workers busy, at least until enough roads are requested.
+            while len(pending) < max(self.workers, self.POPULATION_SIZE - len(startpop)):
+                pending.append(executor.submit(_generate_road, self, seeds.spawn(1)[0]))
+            try:
+                point_list, instrumentation, acceptance = pending.popleft().result()
+            except Exception as e:
+                print(colored("Road generation failed in a worker process: {}".format(e), "red"))
+                continue
+            self.instrumentation.merge(instrumentation)
+            self._record_acceptance(acceptance)
             if point_list is not None:
-                individual = {"control_points": point_list,
-                              "file_name": self.files_name,
-                              "fitness": 0}
-                startpop.append(individual)
-                iterator += 1
+                startpop.append(Individual(point_list, self.files_name))
+        for future in pending:
+            future.cancel()
         return startpop
 
+    def _stored_population(self):
+        """Returns the best roads of earlier runs with the same settings, at most NUMBER_ELITES.
+        :return: List of individuals with their stored fitness values.
+        """
+        if self.store is None:
+            return []
+        return [Individual(points, self.files_name, fitness)
+                for points, fitness in self.store.best(self._road_parameters(), self.NUMBER_ELITES)]
+
     def _mutation(self, individual):
         """Mutates a road by randomly picking one point and replacing it with
          a new, valid one. There is a chance that the individual will be not mutated at all.
@@ -214,28 +441,44 @@ class TestGenerator:
          """
         probability = 0.25
         print(colored("Mutating individual...", "blue"))
+        control_points = individual.points
         iterator = 2
-        while iterator < len(individual.get("control_points")):
-            if random() <= probability:
+        while iterator < len(control_points):
+            if self.rng.random() <= probability:
                 valid = False
                 tries = 0
                 while not valid and tries < self.MAX_TRIES / 10:
-                    new_point = self._generate_random_point(individual.get("control_points")[iterator - 1],
-                                                            individual.get("control_points")[iterator - 2])
-                    new_point = {"x": new_point.get("x"),
-                                 "y": new_point.get("y")}
-                    temp_list = deepcopy(individual.get("control_points"))
-                    temp_list[iterator] = new_point
-                    spline_list = self._bspline(temp_list, 60)
-                    control_points_lines = convert_points_to_lines(spline_list)
-                    linestring_list = self._get_width_lines(spline_list)
-                    if not (intersection_check_all_np(spline_list)
-                            or intersection_check_width(linestring_list, control_points_lines)):
-                        valid = True
-                        individual.get("control_points")[iterator] = new_point
-                    tries += 1
+                    candidates = self._generate_random_points_batch(control_points[iterator - 1],
+                                                                    control_points[iterator - 2],
+                                                                    self.CANDIDATES_PER_BATCH)
+                    candidates = candidates[:int(np.ceil(self.MAX_TRIES / 10 - tries))]
+                    tries += self.CANDIDATES_PER_BATCH - len(candidates)
+                    if len(candidates) == 0:
+                        continue
+
+                    # Evaluate the splines of all candidates at once and take the first valid one.
+                    temp_lists = np.repeat(control_points[np.newaxis], len(candidates), axis=0)
+                    temp_lists[:, iterator] = candidates
+                    spline_lists = bspline_batch(temp_lists, self.SPLINE_DEGREE, 60)
+                    self.instrumentation.count("spline_evaluations", len(candidates))
+                    for temp_list, spline_list in zip(temp_lists, spline_lists):
+                        tries += 1
+                        self.instrumentation.count("mutation_tries")
+                        control_points_lines = points_to_segments(spline_list)
+                        width_list = self._get_width_lines(spline_list)
+                        if not (intersection_check_all_np(spline_list)
+                                or intersection_check_width(width_list, control_points_lines)):
+                            valid = True
+                            temp_list = temp_list.copy()
+                            temp_list.flags.writeable = False
+                            control_points = temp_list
+                            break
             iterator += 1
-        individual["fitness"] = 0
+        if control_points is not individual.points:
+            individual.points = control_points
+        individual.fitness = 0
+        individual.metrics = None
+        individual.estimate = None
         return individual
 
     def _crossover(self, parent1, parent2):
@@ -246,32 +489,28 @@ class TestGenerator:
         """
         print(colored("Performing crossover of two individuals...", "blue"))
         probability = 0.25
-        if len(parent1.get("control_points")) <= len(parent2.get("control_points")):
-            smaller_index = len(parent1.get("control_points"))
-        else:
-            smaller_index = len(parent2.get("control_points"))
+        smaller_index = min(len(parent1), len(parent2))
         iterator = 1
         tries = 0
         while tries < self.MAX_TRIES / 5:
             while iterator < smaller_index:
-                child1 = deepcopy(parent1)
-                child2 = deepcopy(parent2)
-                if random() <= probability:
-                    children = self._recombination(child1, child2, iterator)
+                if self.rng.random() <= probability:
+                    children = self._recombination(parent1, parent2, iterator)
                     child1 = children[0]
                     child2 = children[1]
-                    width_list1 = self._get_width_lines(self._bspline(child1.get("control_points")))
-                    width_list2 = self._get_width_lines(self._bspline(child2.get("control_points")))
-                    control_lines1 = convert_points_to_lines(self._bspline(child1.get("control_points")))
-                    control_lines2 = convert_points_to_lines(self._bspline(child2.get("control_points")))
-                    if not (intersection_check_all(child1.get("control_points"))
-                            or intersection_check_all(child2.get("control_points"))
+                    width_list1 = self._get_individual_width_lines(child1)
+                    width_list2 = self._get_individual_width_lines(child2)
+                    control_lines1 = self._get_segments(child1)
+                    control_lines2 = self._get_segments(child2)
+                    if not (intersection_check_all(child1.points)
+                            or intersection_check_all(child2.points)
                             or intersection_check_width(width_list1, control_lines1)
                             or intersection_check_width(width_list2, control_lines2)):
                         return [child1, child2]
+                    self.instrumentation.count("crossover_retries")
                 iterator += 1
             tries += 1
-        return [parent1, parent2]
+        return [parent1.copy(), parent2.copy()]
 
     @staticmethod
     def _recombination(parent1, parent2, separation_index):
@@ -282,124 +521,97 @@ class TestGenerator:
         :param separation_index: Point where the crossover should happen.
         :return: Return the two recombinated children. Can be invalid.
         """
-        child1_control_points = []
-        child2_control_points = []
-        iterator = 0
-        while iterator <= separation_index:
-            child1_control_points.append(parent1.get("control_points")[iterator])
-            child2_control_points.append(parent2.get("control_points")[iterator])
-            iterator += 1
-        while iterator < len(parent2.get("control_points")):
-            child1_control_points.append(parent2.get("control_points")[iterator])
-            iterator += 1
-        iterator = separation_index + 1
-        while iterator < len(parent1.get("control_points")):
-            child2_control_points.append(parent1.get("control_points")[iterator])
-            iterator += 1
-        child1 = deepcopy(parent1)
-        child1["control_points"] = child1_control_points
-        child2 = deepcopy(parent2)
-        child2["control_points"] = child2_control_points
+        child1_control_points = np.concatenate((parent1.points[:separation_index + 1],
+                                                parent2.points[separation_index + 1:]))
+        child2_control_points = np.concatenate((parent2.points[:separation_index + 1],
+                                                parent1.points[separation_index + 1:]))
+        child1 = parent1.copy()
+        child1.points = child1_control_points
+        child2 = parent2.copy()
+        child2.points = child2_control_points
         children = [child1, child2]
         return children
 
-    def _calculate_fitness_value(self, distances, ticks):
+    @staticmethod
+    def _calculate_fitness_value(individual, metrics):
         """Calculates the fitness value of an individual by measuring the
         elapsed time and the cumulative distance to the center of the road.
-        :param distances: List of traced distances.
-        :param ticks: The AI frequency.
+        :param individual: Individual which was simulated.
+        :param metrics: Metrics of the trace, see TraceBuffer.metrics.
         :return: Void.
         """
-        iterator = 0
-        while iterator < self.POPULATION_SIZE:
-            time = ticks / 60
-            cumulative_distance = sum(distances)
-            self.population_list[iterator]["fitness"] = cumulative_distance / time
+        individual.metrics = metrics
+        if metrics["duration"] > 0:
+            individual.fitness = metrics["cumulative_distance"] / metrics["duration"]
 
-            # Comment the three above lines and comment out the two following lines to use maximum distance as the
-            # fitness function.
-            # max_distance = max(distances)
-            # self.population_list[iterator][1] = max_distance
-            iterator += 1
-            yield
+        # Comment the two above lines and comment out the following line to use maximum distance as the
+        # fitness function.
+        # individual.fitness = metrics["max_distance"]
 
     def _choose_elite(self, population):
-        """Chooses the roads with the best fitness values.
+        """Chooses the roads with the highest fitness values. The fitness grows with the distance of the AI to the road
+         center, so these are the most critical roads. Only roads with a result (simulated or found in the
+         scenario cache or the result store) are ranked. Roads without a result have no measured fitness and only
+         fill the places for which there are not enough results, e.g. before the first simulation of the pipeline
+         finished. Roads which were rejected by the surrogate are left out.
         :param population: List of individuals.
         :return: List of best x individuals according to their fitness value.
         """
-        population = sorted(population, key=lambda k: k['fitness'])
-        elite = []
-        iterator = 0
-        while iterator < self.NUMBER_ELITES:
-            elite.append(population[iterator])
-            iterator += 1
-        return elite
-
-    def _get_resize_factor(self, length):
-        """Returns the resize factor for the width lines so all lines have
-        one specific length.
-        :param length: Length of a LineString.
-        :return: Resize factor.
+        ranked = sorted((individual for individual in population if individual.metrics is not None),
+                        key=lambda k: k['fitness'], reverse=True)
+        pending = [individual for individual in population
+                   if individual.metrics is None and individual.estimate is None]
+        return (ranked + pending)[:self.NUMBER_ELITES]
+
+    def _elite_candidates(self):
+        """Returns the population and the individuals of the last generations which are still waiting for or already
+         got their results. The pipeline chooses the elites before all results of the last generation arrived, so
+         roads whose result arrives later are ranked in the next generation instead of being lost.
+        :return: List of individuals.
         """
-        if length == 0:
-            return 0
-        return self.WIDTH_OF_STREET / length
+        candidates = {id(individual): individual for individual in self.population_list}
+        for _, individual, _ in self._tests.values():
+            candidates.setdefault(id(individual), individual)
+        return list(candidates.values())
 
     def _get_width_lines(self, control_points):
-        """Determines the width lines of the road by flipping the LineString
-         between two points by 90 degrees in both directions.
-        :param control_points: List of control points.
-        :return: List of LineStrings which represent the width of the road.
-        """
-        spline_list = deepcopy(control_points)
-        linestring_list = []
-        iterator = 0
-        while iterator < (len(spline_list) - 1):
-            p1 = (spline_list[iterator][0], spline_list[iterator][1])
-            p2 = (spline_list[iterator + 1][0], spline_list[iterator + 1][1])
-            line = LineString([p1, p2])
-
-            # Rotate counter-clockwise and resize to the half of the road length.
-            line_rot1 = affinity.rotate(line, 90, line.coords[0])
-            line_rot1 = affinity.scale(line_rot1, xfact=self._get_resize_factor(line_rot1.length),
-                                       yfact=self._get_resize_factor(line_rot1.length),
-                                       origin=line_rot1.coords[0])
-
-            # Rotate clockwise and resize to the half of the road length.
-            line_rot2 = affinity.rotate(line, -90, line.coords[0])
-            line_rot2 = affinity.scale(line_rot2, xfact=self._get_resize_factor(line_rot2.length),
-                                       yfact=self._get_resize_factor(line_rot2.length),
-                                       origin=line_rot2.coords[0])
-
-            line = LineString([line_rot1.coords[1], line_rot2.coords[1]])
-            linestring_list.append(line)
-
-            if iterator == len(spline_list) - 2:
-                line = LineString([p1, p2])
-                line_rot1 = affinity.rotate(line, -90, line.coords[1])
-                line_rot1 = affinity.scale(line_rot1, xfact=self._get_resize_factor(line_rot1.length),
-                                           yfact=self._get_resize_factor(line_rot1.length),
-                                           origin=line_rot1.coords[0])
-
-                line_rot2 = affinity.rotate(line, 90, line.coords[1])
-                line_rot2 = affinity.scale(line_rot2, xfact=self._get_resize_factor(line_rot2.length),
-                                           yfact=self._get_resize_factor(line_rot2.length),
-                                           origin=line_rot2.coords[0])
-                line = LineString([line_rot1.coords[1], line_rot2.coords[1]])
-                line = affinity.scale(line, xfact=self._get_resize_factor(line.length)*2,
-                                      yfact=self._get_resize_factor(line.length)*2)
-                linestring_list.append(line)
-            iterator += 1
-        return linestring_list
+        """Determines the width lines of the road. Each width line is perpendicular to the segment starting at its
+         sample and has the length of twice the street width. The last width line belongs to the last sample.
+        :param control_points: Array of spline samples with shape (N, 2).
+        :return: Array of shape (N, 2, 2) which contains both end points of every width line. Use
+                 convert_segments_to_lines if you need LineStrings.
+        """
+        points = np.asarray(control_points, dtype=float).reshape(-1, 2)
+        if len(points) < 2:
+            return np.zeros((0, 2, 2))
+        directions = np.diff(points, axis=0)
+        directions = np.concatenate((directions, directions[-1:]))
+        lengths = np.hypot(directions[:, 0], directions[:, 1])[:, np.newaxis]
+
+        # Rotate the direction by 90 degrees counter-clockwise and resize it to the width of the street.
+        normals = np.divide(self.WIDTH_OF_STREET * directions[:, ::-1], lengths,
+                            out=np.zeros_like(directions), where=lengths != 0)
+        normals[:, 0] *= -1
+        return np.stack((points + normals, points - normals), axis=1)
 
     def _add_width(self, individual):
         """Adds the width value for each control point.
         :param individual: Individual of the population.
         :return: Void.
         """
-        for point in individual.get("control_points"):
-            point["width"] = self.WIDTH_OF_STREET
+        individual.width = self.WIDTH_OF_STREET
+
+    def _spline_individual(self, individual, samples=75):
+        """Converts the control points of an individual to a bspline and adds the width parameter as well as the
+         ego car.
+        :param individual: Individual of the population.
+        :param samples: Number of samples for b-spline interpolation.
+        :return: New individual with bsplined control points.
+        """
+        splined = Individual(self._get_spline(individual, samples), individual.file_name, individual.fitness)
+        self._add_width(splined)
+        _add_ego_car(splined)
+        return splined
 
     def _spline_population(self, population_list, samples=75):
         """Converts the control points list of every individual to a bspline
@@ -408,21 +620,127 @@ class TestGenerator:
         :param samples: Number of samples for b-spline interpolation.
         :return: List of individuals with bsplined control points.
         """
-        iterator = 0
-        while iterator < len(population_list):
-            splined_list = self._bspline(population_list[iterator].get("control_points"), samples)
-            jterator = 0
-            control_points = []
-            while jterator < len(splined_list):
-                point = {"x": splined_list[jterator][0],
-                         "y": splined_list[jterator][1]}
-                control_points.append(point)
-                jterator += 1
-                population_list[iterator]["control_points"] = control_points
-                _add_ego_car(population_list[iterator])
-                self._add_width(population_list[iterator])
-            iterator += 1
-        return population_list
+        return [self._spline_individual(individual, samples) for individual in population_list]
+
+    def _road_parameters(self):
+        """Returns the settings which change the roads and their test files.
+        :return: Tuple of the settings.
+        """
+        return (self.SPLINE_DEGREE, self.MIN_SEGMENT_LENGTH, self.MAX_SEGMENT_LENGTH, self.WIDTH_OF_STREET,
+                self.MIN_NODES, self.MAX_NODES)
+
+    def _scenario_key(self, individual, samples):
+        """Returns the key of an individual in the scenario cache.
+        :param individual: Individual of the population.
+        :param samples: Number of samples for b-spline interpolation.
+        :return: Key as string.
+        """
+        parameters = self._road_parameters()
+        return individual.cached(("scenario_key", parameters, samples),
+                                 lambda points: scenario_key(points, parameters, samples))
+
+    def _load_stored_result(self, individual):
+        """Sets the fitness and metrics of an individual if they are in the result store.
+        :param individual: Individual of the population.
+        :return: {@code True} if the road was found, {@code False} otherwise.
+        """
+        if self.store is None:
+            return False
+        result = self.store.lookup(individual.points, self._road_parameters())
+        if result is None:
+            return False
+        individual.fitness = result["fitness"]
+        individual.metrics = result["metrics"]
+        return True
+
+    def _train_surrogate(self, samples=75):
+        """Trains the surrogate with the result store again if new results were stored.
+        :param samples: Number of samples for b-spline interpolation.
+        :return: Void.
+        """
+        if self.store is None:
+            return
+        history = self.store.history(self._road_parameters())
+        if len(history) == self._trained_samples:
+            return
+        splines = [self._bspline(points, samples) for points, _, _ in history]
+        if self.surrogate.fit(splines, [fitness for _, fitness, _ in history], self.WIDTH_OF_STREET):
+            self._trained_samples = len(history)
+
+    def _screen_population(self, samples=75):
+        """Selects the individuals which are rendered and simulated and loads the results of the result store.
+         Without surrogate these are all individuals. Otherwise individuals which were simulated before are kept,
+         and of the new ones only the surrogate's top_k, but at least enough for the elites. The remaining new
+         individuals keep their fitness and get the estimate of the surrogate instead.
+        :param samples: Number of samples for b-spline interpolation.
+        :return: Tuple of a list of individuals in the order of the population and a set with the ids of the
+                 individuals which were found in the result store.
+        """
+        stored = {id(individual) for individual in self.population_list if self._load_stored_result(individual)}
+        if self.surrogate is None:
+            return self.population_list, stored
+        candidates = [individual for individual in self.population_list
+                      if individual.metrics is None and id(individual) not in stored]
+        count = max(self.surrogate.top_k, self.NUMBER_ELITES - (len(self.population_list) - len(candidates)))
+        if len(candidates) <= count:
+            return self.population_list, stored
+        self._train_surrogate(samples)
+        selected, estimates = self.surrogate.select([self._get_spline(individual, samples)
+                                                     for individual in candidates], self.WIDTH_OF_STREET, count)
+        rejected = set(map(id, candidates)) - {id(candidates[index]) for index in selected}
+        for individual, estimate in zip(candidates, estimates):
+            if id(individual) in rejected:
+                individual.estimate = float(estimate)
+        print(colored("Surrogate skipped {} of {} new roads.".format(len(rejected), len(candidates)), "blue"))
+        return [individual for individual in self.population_list if id(individual) not in rejected], stored
+
+    def _render_population(self, samples=75, population=None, stored=None):
+        """Renders the test files of the population. Roads which are in the scenario cache get their cached files,
+         or no files at all if their fitness is already known from the cache or the result store.
+        :param samples: Number of samples for b-spline interpolation.
+        :param population: Individuals which should be rendered, defaults to the whole population.
+        :param stored: Set with the ids of the individuals which were already loaded from the result store. If it is
+                       None, the result store is searched for every individual.
+        :return: Tuple of a list of tests (test name, individual, cache key), a dict with the file names as keys and
+                 the contents as values, and a list of the newly splined individuals.
+        """
+        tests = []
+        files = {}
+        splined_population = []
+        if population is None:
+            population = self.population_list
+        for iterator, individual in enumerate(population):
+            file_name = individual.file_name + str(iterator)
+            name = "{} generation {}".format(file_name, self.generation)
+            key = None
+            individual_files = None
+            if stored is None:
+                with self.lock:
+                    found = self._load_stored_result(individual)
+            else:
+                found = id(individual) in stored
+            if found:
+                continue
+            if self.cache is not None:
+                key = self._scenario_key(individual, samples)
+                with self.lock:
+                    entry = self.cache.get(key)
+                    if entry is not None and entry["fitness"] is not None:
+                        individual.fitness = entry["fitness"]
+                        individual.metrics = entry["metrics"]
+                        continue
+                    individual_files = self.cache.files(key, file_name, name)
+            if individual_files is None:
+                # Rendering is the expensive part and runs without the lock.
+                splined = self._spline_individual(individual, samples)
+                splined_population.append(splined)
+                name, individual_files = render_xml(splined, iterator, name)
+                if self.cache is not None:
+                    with self.lock:
+                        self.cache.put(key, individual_files, file_name, name)
+            files.update(individual_files)
+            tests.append((name, individual, key))
+        return tests, files, splined_population
 
     def _add_newcomer(self):
         """Adds one new individual into the population.
@@ -431,73 +749,162 @@ class TestGenerator:
         control_points = None
         while control_points is None:
             control_points = self._generate_random_points()
-        individual = {"control_points": control_points,
-                      "file_name": self.files_name,
-                      "fitness": 0}
+            self._record_acceptance(self.last_acceptance)
+        individual = Individual(control_points, self.files_name)
         self._add_width(individual)
         _add_ego_car(individual)
         self.population_list.append(individual)
 
+    def _produce_offspring(self):
+        """Fills the population with mutated children of randomly selected parents. The parents are selected in this
+         process, in rounds with as many pairs as needed to fill the population, so all pairs of a round can be bred
+         in parallel. Every pair gets its own seed and the children are added in the order of the pairs, therefore
+         the result does not depend on the number of workers.
+        :return: Void.
+        """
+        while len(self.population_list) < self.POPULATION_SIZE:
+            pairs = []
+            for _ in range(ceil((self.POPULATION_SIZE - len(self.population_list)) / 2)):
+                selected_indices = self.rng.choice(len(self.population_list), 2, replace=False)
+                pairs.append((self.population_list[selected_indices[0]], self.population_list[selected_indices[1]]))
+            seeds = self.seed_sequence.spawn(len(pairs))
+
+            executor = self._get_executor()
+            if executor is None:
+                for (parent1, parent2), seed in zip(pairs, seeds):
+                    children, instrumentation = _breed(self, parent1, parent2, seed)
+                    self.instrumentation.merge(instrumentation)
+                    self.population_list.extend(children)
+                continue
+
+            futures = [executor.submit(_breed, self, parent1, parent2, seed)
+                       for (parent1, parent2), seed in zip(pairs, seeds)]
+            for future in futures:
+                try:
+                    children, instrumentation = future.result()
+                except Exception as e:
+                    # The missing children are produced in the next round.
+                    print(colored("Breeding failed in a worker process: {}".format(e), "red"))
+                    continue
+                self.instrumentation.merge(instrumentation)
+                self.population_list.extend(children)
+
+    def _publish_population(self):
+        """Starts a new generation with the current population: writes the test files, remembers which test belongs
+         to which individual and plots the roads.
+        :return: Void.
+        """
+        instrumentation = self.instrumentation
+        self.generation += 1
+        with instrumentation.timer("xml_render"):
+            with self.lock:
+                population, stored = self._screen_population(125)
+            tests, files, temp_list = self._render_population(125, population, stored)
+        with instrumentation.timer("xml_write"):
+            paths = write_files(files)
+        self._test_files = [(Path(paths[i]), Path(paths[i + 1])) for i in range(0, len(paths), 2)]
+        instrumentation.count("tests", len(tests))
+
+        # Remember which individual belongs to which test, older generations are not simulated anymore.
+        with self.lock:
+            self._tests = {name: test for name, test in self._tests.items() if test[0] > self.generation - 3}
+            self._tests.update((name, (self.generation, individual, key)) for name, individual, key in tests)
+            self._simulations = {sid: test for sid, test in self._simulations.items()
+                                 if test[0] > self.generation - 3}
+
+        # Comment out if you want to see the generated roads (blocks until you close all images without renderer).
+        # Plot windows only work in the main thread, e.g. the producer of the pipeline needs a renderer.
+        with instrumentation.timer("plot"):
+            if self.renderer is not None:
+                self.renderer.submit(temp_list, self.generation)
+            elif current_thread() is main_thread():
+                plot_all(temp_list)
+
     def genetic_algorithm(self):
         """The main algorithm to generate valid roads. Utilizes a genetic
-         algorithm to evolve more critical roads for a AI.
+         algorithm to evolve more critical roads for a AI. The elites are chosen at the beginning of the next
+         generation, so they use the fitness values of all tests which were simulated in between.
         :return: Void. But it creates xml files.
         """
+        instrumentation = self.instrumentation
+        start = perf_counter()
         if len(self.population_list) == 0:
-            self.population_list = self._create_start_population()
-        while len(self.population_list) < self.POPULATION_SIZE:
-            selected_indices = sample(range(0, len(self.population_list)), 2)
-            parent1 = self.population_list[selected_indices[0]]
-            parent2 = self.population_list[selected_indices[1]]
-            children = self._crossover(parent1, parent2)
-            child1 = children[0]
-            child2 = children[1]
-            child1 = self._mutation(child1)
-            child2 = self._mutation(child2)
-            self.population_list.append(child1)
-            self.population_list.append(child2)
-
-        print(colored("Population finished.", "blue"))
-        temp_list = deepcopy(self.population_list)
-        temp_list = self._spline_population(temp_list, 125)
-        build_all_xml(temp_list)
+            with instrumentation.timer("start_population"):
+                self.population_list = self._create_start_population()
+        else:
+            with self.lock:
+                self.population_list = self._choose_elite(self._elite_candidates())
 
-        # Comment out if you want to see the generated roads (blocks until you close all images).
-        plot_all(temp_list)
-        self.population_list = self._choose_elite(self.population_list)
+            # Introduce new individuals in the population.
+            with instrumentation.timer("newcomer"):
+                self._add_newcomer()
+        with instrumentation.timer("offspring"):
+            self._produce_offspring()
 
-        # Introduce new individuals in the population.
-        self._add_newcomer()
+        print(colored("Population finished.", "blue"))
+        self._publish_population()
+        self._update_acceptance()
+        instrumentation.count("generations")
+        instrumentation.add_time("generation", perf_counter() - start)
+        instrumentation.dump()
 
     def set_files_name(self, new_name):
         """Sets a new name for the created xml files."""
         self.files_name = new_name
 
     def getTest(self) -> Optional[Tuple[Path, Path]]:
-        """Returns the two first test files starting with "files_name".
+        """Runs one generation and returns the test files which have to be simulated. Roads with a fitness value in
+         the scenario cache or the result store and roads rejected by the surrogate are skipped.
         :return: Tuple of the path to the dbe and dbc file.
         """
-        destination_path = path.dirname(path.realpath(__file__)) + "\\scenario"
-        xml_names = destination_path + "\\" + self.files_name + "*"
-        iterator = 0
         self.genetic_algorithm()
-        matches = glob(xml_names)
-        while iterator < self.POPULATION_SIZE * 2 - 1:
-            yield Path(matches[iterator + 1]), Path(matches[iterator])
-            iterator += 2
+        for environment, criteria in self._test_files:
+            yield environment, criteria
 
-    def onTestFinished(self, sid, vid):
+    def _get_service(self):
+        """Returns the default DriveBuild service. It is created on the first call and reused afterwards.
+        :return: AIExchangeService.
+        """
+        # Change service if your configuration differs.
+        if self._service is None:
+            self._service = AIExchangeService("localhost", 8383)
+        return self._service
+
+    def onTestSubmitted(self, test_name, sid):
+        """This method is called after a test was submitted to DriveBuild. It connects the simulation with the
+        individual of the test, so onTestFinished can update the right fitness value.
+        :param test_name: Name of the test as returned by run_tests.
+        :param sid: Simulation ID.
+        :return: Void.
+        """
+        with self.lock:
+            test = self._tests.get(test_name)
+            if test is not None:
+                self._simulations[sid.sid] = test
+        if test is None:
+            print(colored("Unknown test {}.".format(test_name), "red"))
+
+    def onTestFinished(self, sid, vid, service=None):
         """This method is called after a test was finished in DriveBuild.
         Also updates fitness value of an individual.
         :param sid: Simulation ID.
         :param vid: Vehicle ID (only one participant).
+        :param service: AIExchangeService which ran the test. Defaults to a service on localhost.
         :return: Void.
         """
-        # Change service if your configuration differs.
-        service = AIExchangeService("localhost", 8383)
-        trace_data = service.get_trace(sid, vid)
-        distances = []
-        for i in range(0, len(trace_data)):
-            distances.append(trace_data[i][3].data["egoLaneDist"].road_center_distance.distance)
-        ticks = trace_data[-1][2]
-        self._calculate_fitness_value(distances, ticks)
+        with self.lock:
+            test = self._simulations.pop(sid.sid, None)
+        if test is None:
+            print(colored("Simulation {} belongs to no known test, call onTestSubmitted first.".format(sid.sid),
+                          "red"))
+            return
+        if service is None:
+            service = self._get_service()
+        trace = TraceBuffer(self.DISTANCE_THRESHOLD)
+        trace.extend(service.get_trace(sid, vid))
+        with self.lock:
+            self._calculate_fitness_value(test[1], trace.metrics())
+            if self.cache is not None and test[2] is not None:
+                self.cache.put_result(test[2], test[1].fitness, test[1].metrics)
+        if self.store is not None:
+            self.store.record(test[1].points, self._road_parameters(), test[1].fitness, test[1].metrics)
@@ -0,0 +1,67 @@
+"""This file offers the b-spline evaluation which is used as road representation. For a fixed number of control
+  points, degree and samples the knot vector and the basis functions never change, so the basis matrix is computed
+  once and every spline evaluation is a single matrix multiplication.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import scipy.interpolate as si
+
+
+def clip_degree(degree, count):
+    """Returns the spline degree which can be used for a given number of control points.
+    :param degree: Desired degree (sharpness of curves).
+    :param count: Number of control points.
+    :return: Degree between 1 and count - 1.
+    """
+    return int(np.clip(degree, 1, count - 1))
+
+
+def knot_vector(count, degree):
+    """Calculates the clamped, uniform knot vector of a b-spline.
+    :param count: Number of control points.
+    :param degree: Degree of the spline.
+    :return: Knot vector as numpy array.
+    """
+    return np.concatenate(([0] * degree, np.arange(count - degree + 1), [count - degree] * degree))
+
+
+@lru_cache(maxsize=256)
+def basis_matrix(count, degree, samples):
+    """Returns the values of all basis functions at {@code samples} equidistant parameters. The result is cached,
+     the cache holds at most 256 matrices.
+    :param count: Number of control points.
+    :param degree: Degree of the spline.
+    :param samples: Number of samples.
+    :return: Read-only array of shape (samples, count).
+    """
+    u = np.linspace(0, count - degree, samples)
+
+    # Evaluating the spline with the unit vectors as coefficients yields one basis function each.
+    matrix = np.array(si.splev(u, (knot_vector(count, degree), np.eye(count), degree))).T
+    matrix.flags.writeable = False
+    return matrix
+
+
+def bspline(control_points, degree, samples=75):
+    """Calculates {@code samples} samples on a b-spline.
+    :param control_points: Array of control points with shape (N, 2).
+    :param degree: Desired degree, gets clipped to the number of control points.
+    :param samples: Number of samples to return.
+    :return: Array of samples with shape (samples, 2).
+    """
+    count = len(control_points)
+    return basis_matrix(count, clip_degree(degree, count), samples) @ control_points
+
+
+def bspline_batch(control_points, degree, samples=75):
+    """Calculates the samples of several b-splines with the same number of control points in one call.
+    :param control_points: Array of control polygons with shape (K, N, 2).
+    :param degree: Desired degree, gets clipped to the number of control points.
+    :param samples: Number of samples of each spline.
+    :return: Array of samples with shape (K, samples, 2).
+    """
+    control_points = np.asarray(control_points, dtype=float)
+    count = control_points.shape[1]
+    return np.matmul(basis_matrix(count, clip_degree(degree, count), samples), control_points)
@@ -0,0 +1,64 @@
+"""This file offers a component which waits for simulations to finish without fixed sleeps."""
+
+from threading import Event, Lock
+from time import monotonic
+
+
+class CompletionWaiter:
+    """Waits for the end of simulations by polling with an adaptive backoff: the first checks follow each other
+     quickly, and the interval grows with every check which finds the simulation still running, up to a maximum.
+     Other threads (e.g. a callback of the AI) can call notify to trigger the next check immediately.
+    """
+
+    def __init__(self, initial_interval=0.1, max_interval=5, factor=2, timeout=None):
+        """
+        :param initial_interval: Seconds between the first two checks.
+        :param max_interval: Maximum number of seconds between two checks.
+        :param factor: Growth of the interval after each check.
+        :param timeout: Maximum number of seconds to wait for a simulation, None waits forever.
+        """
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.timeout = timeout
+        self._events = {}
+        self._lock = Lock()
+
+    def notify(self, sid):
+        """Wakes up the thread which waits for the given simulation, so it checks the simulation again.
+        :param sid: Simulation ID as string.
+        :return: Void.
+        """
+        with self._lock:
+            event = self._events.get(sid)
+        if event is not None:
+            event.set()
+
+    def wait(self, sid, is_finished):
+        """Blocks until the simulation is finished or the timeout is reached.
+        :param sid: Simulation ID as string.
+        :param is_finished: Function without parameters which checks whether the simulation is finished.
+        :return: Tuple of a bool ({@code True} if the simulation finished, {@code False} on timeout) and the number
+                 of checks.
+        """
+        event = Event()
+        with self._lock:
+            self._events[sid] = event
+        try:
+            start = monotonic()
+            interval = self.initial_interval
+            checks = 0
+            while True:
+                checks += 1
+                if is_finished():
+                    return True, checks
+                remaining = None if self.timeout is None else self.timeout - (monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    return False, checks
+                if event.wait(interval if remaining is None else min(interval, remaining)):
+                    event.clear()
+                else:
+                    interval = min(interval * self.factor, self.max_interval)
+        finally:
+            with self._lock:
+                del self._events[sid]
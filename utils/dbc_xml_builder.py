@@ -3,11 +3,27 @@
 """
 
 import xml.etree.ElementTree as ElementTree
-from os import path
-from os import remove
-from pathlib import Path
-from shutil import move
-import os
+from io import BytesIO
+
+from utils.files import write_files
+from utils.xml_stream import StreamedTags
+
+
+def _waypoint_tags(waypoints):
+    """Returns the waypoint tags of a participant.
+    :param waypoints: List of dicts containing waypoints, see add_car.
+    :return: List of tags as strings.
+    """
+    tags = []
+    for waypoint in waypoints:
+        tag = 'waypoint x="{}" y="{}" tolerance="{}" movementMode="{}"'.format(str(waypoint.get("x")),
+                                                                              str(waypoint.get("y")),
+                                                                              str(waypoint.get("tolerance")),
+                                                                              waypoint.get("movementMode"))
+        if waypoint.get("speedLimit"):
+            tag += ' speedLimit="{}"'.format(str(waypoint.get("speedLimit")))
+        tags.append(tag)
+    return tags
 
 
 class DBCBuilder:
@@ -35,6 +51,9 @@ class DBCBuilder:
 
         self.failure = ElementTree.SubElement(self.root, "failure")
 
+        # Tags which are rendered only when the file is serialized.
+        self.streamed = StreamedTags()
+
     def define_name(self, file_name):
         """Defines the name of the test (not the file name). Required tag.
         :param file_name: Name of this test.
@@ -68,7 +87,7 @@ class DBCBuilder:
         aifreq = ElementTree.SubElement(self.root, "aiFrequency")
         aifreq.text = str(frequency)
 
-    def add_car(self, participant):
+    def add_car(self, participant, stream=False):
         """Adds a car to this test case. At least one car (the ego car) should be added.
         :param participant: Dict which contains init_state, waypoints, participant_id and model. See the lines below
                             for more information:
@@ -80,6 +99,8 @@ class DBCBuilder:
                      speedLimit (int) (optional)
                 participant_id: unique ID of this participant as String.
                 model: BeamNG model car as String. See beamngpy documentation for more models.
+        :param stream: {@code True} renders the waypoints when the file is serialized instead of adding them to the
+                       tree. The file stays the same.
         :return: Void
         """
         participant_id = participant.get("id")
@@ -102,14 +123,12 @@ class DBCBuilder:
                               .format(str(600), str(400), str(120), "FRONT", "egoFrontCamera"))
 
         movement = ElementTree.SubElement(participant, "movement")
-        for waypoint in waypoints:
-            waypoint_tag = ElementTree.SubElement(movement, 'waypoint x="{}" y="{}" tolerance="{}"'
-                                                            ' movementMode="{}"'
-                                                  .format(str(waypoint.get("x")), str(waypoint.get("y")),
-                                                          str(waypoint.get("tolerance")),
-                                                          waypoint.get("movementMode")))
-            if waypoint.get("speedLimit"):
-                waypoint_tag.set("speedLimit", str(waypoint.get("speedLimit")))
+        tags = _waypoint_tags(waypoints)
+        if stream:
+            self.streamed.add(movement, tags, 4)
+        else:
+            for tag in tags:
+                ElementTree.SubElement(movement, tag)
 
     def add_precond_partic_sc_speed(self, vc_pos, sc_speed):
         """Adds a precondition for a position, which must be satisfied in order to continue the test.
@@ -186,30 +205,21 @@ class DBCBuilder:
             if level and (not elem.tail or not elem.tail.strip()):
                 elem.tail = i
 
-    def save_xml(self, name):
-        """Creates and saves the XML file, and moves it to the scenario folder.
+    def to_bytes(self, pretty=True):
+        """Serializes the XML file in memory.
+        :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
+        :return: Content of the XML file as bytes.
+        """
+        if pretty:
+            self.indent(self.root)
+        buffer = BytesIO()
+        ElementTree.ElementTree(self.root).write(buffer, encoding="utf-8", xml_declaration=True)
+        return self.streamed.splice(buffer.getvalue(), pretty)
+
+    def save_xml(self, name, pretty=True):
+        """Creates and saves the XML file in the scenario folder.
         :param name: Desired name of this file.
+        :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
         :return: Void, but it creates a XML file.
         """
-        # Wrap it in an ElementTree instance, and save as XML.
-        tree = ElementTree.ElementTree(self.root)
-        self.indent(self.root)
-        full_name = name + '.dbc.xml'
-
-        current_path_of_file = Path(os.getcwd())
-        current_path_of_file = os.path.realpath(current_path_of_file) + "\\" + full_name
-
-        destination_path = Path(os.getcwd())
-        destination_path = os.path.realpath(destination_path) + "\\scenario"
-
-        tree.write(full_name, encoding="utf-8", xml_declaration=True)
-
-        if not path.exists(destination_path):
-            os.mkdir(destination_path)
-
-        # Delete old files with the same name.
-        if path.exists(destination_path + "\\" + full_name):
-            remove(destination_path + "\\" + full_name)
-
-        # Move created file to scenario folder.
-        move(current_path_of_file, destination_path)
+        write_files({name + '.dbc.xml': self.to_bytes(pretty)})
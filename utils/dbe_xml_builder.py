@@ -1,11 +1,24 @@
 """This class builds an environment XML file for DriveBuild in the required format."""
 
 import xml.etree.ElementTree as ElementTree
-from os import path
-import os
-from os import remove
-from pathlib import Path
-from shutil import move
+from io import BytesIO
+
+import numpy as np
+
+from utils.files import write_files
+from utils.xml_stream import StreamedTags
+
+
+def _lane_segment_tags(segments, width=None):
+    """Returns the laneSegment tags of a lane.
+    :param segments: List of dicts containing x-coordinate, y-coordinate and width or array of shape (N, 2).
+    :param width: Width of all segments, only used if segments is an array.
+    :return: List of tags as strings.
+    """
+    if isinstance(segments, np.ndarray):
+        return ['laneSegment x="{}" y="{}" width="{}"'.format(x, y, width) for x, y in segments.tolist()]
+    return ['laneSegment x="{}" y="{}" width="{}"'.format(segment.get("x"), segment.get("y"), segment.get("width"))
+            for segment in segments]
 
 
 class DBEBuilder:
@@ -25,6 +38,9 @@ class DBEBuilder:
 
         self.lanes = ElementTree.SubElement(self.root, "lanes")
 
+        # Tags which are rendered only when the file is serialized.
+        self.streamed = StreamedTags()
+
     def indent(self, elem, level=0):
         """Pretty prints a xml file.
         :param elem: XML tag.
@@ -92,12 +108,16 @@ class DBEBuilder:
                 full_string += ' upperLength="' + str(upperLength) + '"'
             ElementTree.SubElement(obstacles, full_string)
 
-    def add_lane(self, segments, markings: bool = True, left_lanes: int = 0, right_lanes: int = 0):
+    def add_lane(self, segments, markings: bool = True, left_lanes: int = 0, right_lanes: int = 0,
+                 stream: bool = False, width=None):
         """Adds a lane and road segments.
-        :param segments: List of dicts containing x-coordinate, y-coordinate and width.
+        :param segments: List of dicts containing x-coordinate, y-coordinate and width, or array of shape (N, 2).
         :param markings: {@code True} Enables road markings, {@code False} makes them invisible.
         :param left_lanes: number of left lanes
         :param right_lanes: number of right lanes
+        :param stream: {@code True} renders the road segments when the file is serialized instead of adding them to
+                       the tree. The file stays the same.
+        :param width: Width of all road segments if segments is an array.
         :return: Void
         """
         lane = ElementTree.SubElement(self.lanes, "lane")
@@ -107,34 +127,28 @@ class DBEBuilder:
             lane.set("leftLanes", str(left_lanes))
         if right_lanes != 0 and right_lanes is not None:
             lane.set("rightLanes", str(right_lanes))
-        for segment in segments:
-            ElementTree.SubElement(lane, 'laneSegment x="{}" y="{}" width="{}"'
-                                   .format(segment.get("x"), segment.get("y"), segment.get("width")))
+        tags = _lane_segment_tags(segments, width)
+        if stream:
+            self.streamed.add(lane, tags, 3)
+        else:
+            for tag in tags:
+                ElementTree.SubElement(lane, tag)
 
-    def save_xml(self, name):
-        """Creates and saves the XML file, and moves it to the scenario folder.
+    def to_bytes(self, pretty=True):
+        """Serializes the XML file in memory.
+        :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
+        :return: Content of the XML file as bytes.
+        """
+        if pretty:
+            self.indent(self.root)
+        buffer = BytesIO()
+        ElementTree.ElementTree(self.root).write(buffer, encoding="utf-8", xml_declaration=True)
+        return self.streamed.splice(buffer.getvalue(), pretty)
+
+    def save_xml(self, name, pretty=True):
+        """Creates and saves the XML file in the scenario folder.
         :param name: Desired name of this file.
+        :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
         :return: Void, but it creates a XML file.
         """
-        # Wrap it in an ElementTree instance, and save as XML.
-        tree = ElementTree.ElementTree(self.root)
-        self.indent(self.root)
-        full_name = name + '.dbe.xml'
-
-        current_path_of_file = Path(os.getcwd())
-        current_path_of_file = os.path.realpath(current_path_of_file) + "\\" + full_name
-
-        destination_path = Path(os.getcwd())
-        destination_path = os.path.realpath(destination_path) + "\\scenario"
-
-        tree.write(full_name, encoding="utf-8", xml_declaration=True)
-
-        if not path.exists(destination_path):
-            os.mkdir(destination_path)
-
-        # Delete old files with the same name.
-        if path.exists(destination_path + "\\" + full_name):
-            remove(destination_path + "\\" + full_name)
-
-        # Move created file to scenario folder.
-        move(current_path_of_file, destination_path)
+        write_files({name + '.dbe.xml': self.to_bytes(pretty)})
@@ -0,0 +1,47 @@
+"""This file offers methods to write the generated test files."""
+
+import os
+from os import path
+
+
+def scenario_folder():
+    """Returns the folder of the generated test files, which is the folder "scenario" in the working directory.
+    :return: Path of the folder as string.
+    """
+    return path.join(os.path.realpath(os.getcwd()), "scenario")
+
+
+def write_file(file_path, data, atomic=True):
+    """Writes bytes into a file. Atomic writes go into a temporary file first, which then replaces the target, so
+     nobody can read a half written file.
+    :param file_path: Path of the file.
+    :param data: Content as bytes.
+    :param atomic: {@code True} to replace the file atomically, {@code False} to write it directly.
+    :return: Void.
+    """
+    if not atomic:
+        with open(file_path, "wb") as f:
+            f.write(data)
+        return
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+
+
+def write_files(files, folder=None, atomic=True):
+    """Writes several files into one folder, e.g. all test files of a generation.
+    :param files: Dict with file names as keys and the contents as bytes as values.
+    :param folder: Target folder, defaults to the scenario folder. It is created if it does not exist.
+    :param atomic: {@code True} to replace the files atomically, {@code False} to write them directly.
+    :return: List of the paths of the written files.
+    """
+    if folder is None:
+        folder = scenario_folder()
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for file_name, data in files.items():
+        file_path = path.join(folder, file_name)
+        write_file(file_path, data, atomic)
+        paths.append(file_path)
+    return paths
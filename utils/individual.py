@@ -0,0 +1,122 @@
+"""This class represents one individual (a road) of the population."""
+
+import numpy as np
+
+from utils.validity_checks import as_point_array
+
+
+class Individual:
+    """A road of the population. The control points are stored as one contiguous float64 array of shape (N, 2),
+     which is read-only and gets replaced as a whole. Derived data like spline samples, segments or width lines is
+     cached per individual and dropped when the control points change. Individuals also offer the dict interface
+     (individual.get("control_points"), individual["fitness"] = 0, ...), so the xml creation keeps working.
+    """
+
+    __slots__ = ("_points", "_cache", "file_name", "fitness", "metrics", "estimate", "width", "participants",
+                 "obstacles", "left_lanes", "right_lanes")
+
+    _KEYS = frozenset(("control_points", "file_name", "fitness", "metrics", "estimate", "width", "participants",
+                       "obstacles", "left_lanes", "right_lanes"))
+
+    def __init__(self, control_points, file_name="exampleTest", fitness=0):
+        """
+        :param control_points: Array-like of shape (N, 2) or list of dicts containing points.
+        :param file_name: Name of the xml files of this individual.
+        :param fitness: Fitness value of this individual.
+        """
+        self.points = control_points
+        self.file_name = file_name
+        self.fitness = fitness
+        self.metrics = None
+        # Fitness estimated by the surrogate if the road was not simulated, None otherwise.
+        self.estimate = None
+        self.width = None
+        self.participants = None
+        self.obstacles = None
+        self.left_lanes = None
+        self.right_lanes = None
+
+    @property
+    def points(self):
+        """Returns the control points as read-only array of shape (N, 2)."""
+        return self._points
+
+    @points.setter
+    def points(self, control_points):
+        points = as_point_array(control_points)
+        # Read-only arrays can be shared, everything else is copied so nobody can change the points afterwards.
+        if points.flags.writeable or points.dtype != np.float64:
+            points = np.array(points, dtype=np.float64)
+            points.flags.writeable = False
+        self._points = points
+        self._cache = {}
+
+    @property
+    def control_points(self):
+        """Returns the control points as list of dicts, including the width of the road if it is set."""
+        if self.width is None:
+            return [{"x": x, "y": y} for x, y in self._points.tolist()]
+        return [{"x": x, "y": y, "width": self.width} for x, y in self._points.tolist()]
+
+    def copy(self):
+        """Returns a copy of this individual. Control points are read-only, so the copy shares the points array and
+         the cached derived data with this individual until one of them gets new control points (copy-on-write).
+        :return: Copy of this individual.
+        """
+        individual = Individual.__new__(Individual)
+        for slot in self.__slots__:
+            setattr(individual, slot, getattr(self, slot))
+        return individual
+
+    def __getstate__(self):
+        # The cached data can be computed again and is not worth sending to other processes.
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state["_cache"] = {}
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._points.flags.writeable = False
+
+    def cached(self, key, function):
+        """Returns derived data of the control points and computes it only on the first call.
+        :param key: Hashable key which describes the derived data, e.g. ("spline", degree, samples).
+        :param function: Function which gets the control points array and computes the data.
+        :return: Derived data.
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = function(self._points)
+            self._cache[key] = value
+            return value
+
+    def __len__(self):
+        return len(self._points)
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        if key == "control_points":
+            key = "points"
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._KEYS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        """Dict compatible access to the attributes of this individual.
+        :param key: Attribute name, e.g. "control_points" or "fitness".
+        :param default: Returned if the attribute does not exist or is not set.
+        :return: Value of the attribute.
+        """
+        if key not in self._KEYS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
@@ -0,0 +1,153 @@
+"""This file offers counters and timers to see where the time of a generation goes. Disabled instrumentation does
+  nothing, so it can stay in the hot paths.
+"""
+
+import json
+from contextlib import nullcontext
+from time import perf_counter
+
+from utils.files import write_file
+
+_NO_TIMER = nullcontext()
+
+
+class _Timer:
+    """Context manager which adds the elapsed time to a timer of the instrumentation."""
+
+    __slots__ = ("_instrumentation", "_name", "_start")
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._instrumentation.add_time(self._name, perf_counter() - self._start)
+        return False
+
+
+class Instrumentation:
+    """Collects counters (e.g. rejected candidates) and timers (e.g. the time needed to write the xml files) of the
+     test generator. The values add up over all generations.
+    """
+
+    def __init__(self, enabled=True, output=None, output_format="json"):
+        """
+        :param enabled: {@code False} turns every method into a no-op.
+        :param output: Optional path of a file which gets the values at the end of every generation.
+        :param output_format: Format of the output file, "json" or "prometheus".
+        """
+        if output_format not in ("json", "prometheus"):
+            raise ValueError("Unknown output format {}.".format(output_format))
+        self.enabled = enabled
+        self.output = output
+        self.output_format = output_format
+        self.counters = {}
+        self.timers = {}                    # Name -> [calls, total seconds, maximum seconds]
+
+    def child(self):
+        """Returns an empty instrumentation with the same settings, e.g. for a worker process. Its values are added
+         with merge.
+        :return: Instrumentation.
+        """
+        return Instrumentation(self.enabled)
+
+    def count(self, name, amount=1):
+        """Increases a counter.
+        :param name: Name of the counter.
+        :param amount: Value which is added.
+        :return: Void.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, seconds):
+        """Adds a measured time to a timer.
+        :param name: Name of the timer.
+        :param seconds: Measured time.
+        :return: Void.
+        """
+        if not self.enabled:
+            return
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def timer(self, name):
+        """Returns a context manager which measures the time of its block, e.g. "with instrumentation.timer('x'):".
+        :param name: Name of the timer.
+        :return: Context manager.
+        """
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name)
+
+    def merge(self, other):
+        """Adds the values of another instrumentation, e.g. of a worker process.
+        :param other: Instrumentation.
+        :return: Void.
+        """
+        if not self.enabled or other is None:
+            return
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for name, (calls, total, maximum) in other.timers.items():
+            timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += calls
+            timer[1] += total
+            timer[2] = max(timer[2], maximum)
+
+    def reset(self):
+        """Removes all values.
+        :return: Void.
+        """
+        self.counters = {}
+        self.timers = {}
+
+    def snapshot(self):
+        """Returns a copy of all values.
+        :return: Dict with the counters and the timers (calls, total and maximum seconds).
+        """
+        return {"counters": dict(self.counters),
+                "timers": {name: {"calls": calls, "seconds": total, "max_seconds": maximum}
+                           for name, (calls, total, maximum) in self.timers.items()}}
+
+    def to_json(self):
+        """Returns all values as JSON string.
+        :return: String.
+        """
+        return json.dumps(self.snapshot(), indent=4, sort_keys=True)
+
+    def to_prometheus(self, prefix="test_generator"):
+        """Returns all values in the text format of Prometheus.
+        :param prefix: Prefix of all metric names.
+        :return: String.
+        """
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append("# TYPE {}_{}_total counter".format(prefix, name))
+            lines.append("{}_{}_total {}".format(prefix, name, value))
+        for name, (calls, total, maximum) in sorted(self.timers.items()):
+            metric = "{}_{}_seconds".format(prefix, name)
+            lines.append("# TYPE {} summary".format(metric))
+            lines.append("{}_sum {!r}".format(metric, total))
+            lines.append("{}_count {}".format(metric, calls))
+            lines.append("# TYPE {}_max gauge".format(metric))
+            lines.append("{}_max {!r}".format(metric, maximum))
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """Writes all values into the output file, if there is one.
+        :return: Void.
+        """
+        if not self.enabled or self.output is None:
+            return
+        text = self.to_json() if self.output_format == "json" else self.to_prometheus()
+        write_file(self.output, text.encode("utf-8"))
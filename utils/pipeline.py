@@ -0,0 +1,268 @@
+"""This file offers a pipeline which generates the next tests while DriveBuild simulates the previous ones."""
+
+from pathlib import Path
+from queue import Empty, Full, Queue
+from shutil import copy, rmtree
+from tempfile import mkdtemp
+from threading import Condition, Event, Thread
+from time import monotonic
+
+from drivebuildclient.aiExchangeMessages_pb2 import Control, SimStateResponse
+from termcolor import colored
+
+from utils.completion import CompletionWaiter
+from utils.simulator_pool import SimulatorError, SimulatorPool
+
+# Put into the queue by the producer when all requested generations are done.
+_DONE = object()
+
+
+def _snapshot(environment, criteria):
+    """Copies the files of a test into a new temporary folder, so the next generation can overwrite the originals
+     while the test still waits for the simulation. The dbc file references the dbe file by its name, therefore both
+     files are copied into the same folder.
+    :param environment: Path to the dbe file.
+    :param criteria: Path to the dbc file.
+    :return: Tuple of the temporary folder, the paths to the copied dbe and dbc file and the creation time.
+    """
+    folder = mkdtemp(prefix="test_")
+    return folder, Path(copy(str(environment), folder)), Path(copy(str(criteria), folder)), monotonic()
+
+
+class SimulationPipeline:
+    """Producer and consumers of tests, connected by a bounded queue. The producer thread runs the genetic algorithm
+     and writes the xml files, the consumer threads submit the tests to DriveBuild, wait for the simulations and pass
+     the results to the generator. There is one consumer for every test the simulators can run at once. The size of
+     the queue limits how far the generation can be ahead of the simulation.
+     Because generation k + 1 is created while generation k is simulated, its elites are chosen before all results
+     of generation k are known. Roads without result are not ranked, their results are used when the elites of the
+     following generation are chosen. Use wait_for_results to choose the elites with all results, the creation of a
+     generation does not overlap with the simulation then.
+    """
+
+    def __init__(self, generator, service, vid, queue_size=None, prepare_test=None, start_ai=None, stop_ai=None,
+                 username="test", password="test", waiter=None, wait_for_results=False):
+        """
+        :param generator: TestGenerator which creates the tests.
+        :param service: AIExchangeService (or any object with the same methods) which runs the tests, or a
+                        SimulatorPool to distribute the tests over several endpoints.
+        :param vid: VehicleID of the ego car.
+        :param queue_size: Maximum number of generated tests which wait for the simulation. Defaults to the population
+                           size of the generator or the number of simulator slots if that is higher.
+        :param prepare_test: Optional function which gets the paths of the dbe and dbc file before they are submitted,
+                             e.g. to add data requests.
+        :param start_ai: Optional function which gets the simulation ID and starts the AI. Its return value is passed
+                         to stop_ai.
+        :param stop_ai: Optional function which stops the AI after the simulation.
+        :param username: User name for DriveBuild.
+        :param password: Password for DriveBuild.
+        :param waiter: CompletionWaiter which waits for the end of the simulations. Defaults to one without timeout.
+        :param wait_for_results: {@code True} if the next generation is only created after all tests of the previous
+                                 generation are simulated.
+        """
+        self.generator = generator
+        self.pool = service if isinstance(service, SimulatorPool) else SimulatorPool([service])
+        self.vid = vid
+        self.prepare_test = prepare_test
+        self.start_ai = start_ai
+        self.stop_ai = stop_ai
+        self.username = username
+        self.password = password
+        self.waiter = waiter if waiter is not None else CompletionWaiter()
+        self.wait_for_results = wait_for_results
+        # One dict per simulation with the seconds the test waited for a simulator and the seconds it was simulated.
+        self.timings = []
+        if queue_size is None:
+            queue_size = max(generator.POPULATION_SIZE, self.pool.slots)
+        self.queue = Queue(maxsize=queue_size)
+        # Number of tests which were generated but are not simulated yet.
+        self._pending = 0
+        self._idle = Condition()
+        self._stopped = Event()
+        self._error = None
+
+    def _put(self, item):
+        """Puts an item into the queue and waits while the queue is full.
+        :param item: Item for the consumer.
+        :return: {@code True} if the item was put into the queue, {@code False} if the pipeline was stopped.
+        """
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _produce(self, generations):
+        """Generates tests until the given number of generations is reached or the pipeline is stopped.
+        :param generations: Number of generations or None for no limit.
+        :return: Void.
+        """
+        try:
+            generation = 0
+            while not self._stopped.is_set() and (generations is None or generation < generations):
+                if self.wait_for_results:
+                    self._wait_until_idle()
+                # The generator holds its lock itself while it reads or changes the fitness values.
+                tests = [_snapshot(environment, criteria) for environment, criteria in self.generator.getTest()]
+                with self._idle:
+                    self._pending += len(tests)
+                for test in tests:
+                    if not self._put(test):
+                        rmtree(test[0], ignore_errors=True)
+                generation += 1
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def _wait_until_idle(self):
+        """Blocks until all generated tests are simulated or the pipeline is stopped.
+        :return: Void.
+        """
+        with self._idle:
+            while self._pending > 0 and not self._stopped.is_set():
+                self._idle.wait(timeout=0.1)
+
+    def _finish_test(self):
+        """Counts one generated test as simulated.
+        :return: Void.
+        """
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    def _wait_for_simulation(self, node, sid):
+        """Blocks until the simulation is not running anymore or the timeout of the waiter is reached.
+        :param node: SimulatorNode which runs the simulation.
+        :param sid: Simulation ID.
+        :return: Tuple of a bool ({@code True} if the simulation finished) and the number of checks.
+        """
+        return self.waiter.wait(sid.sid, lambda: node.call("wait_for_simulator_request", sid, self.vid)
+                                is not SimStateResponse.SimState.RUNNING)
+
+    def _run_on_node(self, node, environment, criteria, created):
+        """Submits one test to an endpoint, waits for its simulations and updates the fitness values. Only failures of
+         the endpoint raise a SimulatorError, errors of the generator and the AI functions are raised as they are.
+        :param node: SimulatorNode which runs the test.
+        :param environment: Path to the dbe file.
+        :param criteria: Path to the dbc file.
+        :param created: Time (monotonic) at which the test was generated.
+        :return: Void.
+        """
+        submitted = monotonic()
+        submission_result = node.call("run_tests", self.username, self.password, environment, criteria)
+        if submission_result is None:
+            raise SimulatorError("Upload of {} failed.".format(criteria.name))
+        if not submission_result.submissions:
+            print(colored("{} contains no valid test.".format(criteria.name), "red"))
+            return
+        for test_name, sid in submission_result.submissions.items():
+            self.generator.onTestSubmitted(test_name, sid)
+        for test_name, sid in submission_result.submissions.items():
+            self.pool.track(node, sid)
+            ai = self.start_ai(sid) if self.start_ai is not None else None
+            try:
+                finished, checks = self._wait_for_simulation(node, sid)
+            finally:
+                if self.stop_ai is not None:
+                    self.stop_ai(ai)
+            timing = {"sid": sid.sid,
+                      "node": node.name,
+                      "waiting": submitted - created,
+                      "simulating": monotonic() - submitted,
+                      "checks": checks,
+                      "finished": finished}
+            self.timings.append(timing)
+            if not finished:
+                control = Control()
+                control.simCommand.command = Control.SimCommand.Command.CANCEL
+                node.call("control", sid, self.vid, control)
+                self.pool.untrack(node, sid)
+                print(colored("Simulation {} timed out after {:.1f} s and was cancelled."
+                              .format(sid.sid, timing["simulating"]), "red"))
+                continue
+            print(colored("Simulation {} finished after {:.1f} s (waited {:.1f} s for a simulator)."
+                          .format(sid.sid, timing["simulating"], timing["waiting"]), "blue"))
+            self.generator.onTestFinished(sid, self.vid, node.service)
+            self.pool.untrack(node, sid)
+
+    def run_test(self, environment, criteria, created=None):
+        """Runs one test on a free endpoint of the pool and retries it on another endpoint if the endpoint fails.
+        :param environment: Path to the dbe file.
+        :param criteria: Path to the dbc file.
+        :param created: Time (monotonic) at which the test was generated, defaults to now.
+        :return: Void.
+        """
+        if created is None:
+            created = monotonic()
+        if self.prepare_test is not None:
+            self.prepare_test(environment, criteria)
+        self.pool.run(lambda node: self._run_on_node(node, environment, criteria, created))
+
+    def _consume(self):
+        """Runs the generated tests until all generations are simulated or the pipeline is stopped.
+        :return: Void.
+        """
+        while not self._stopped.is_set():
+            try:
+                item = self.queue.get(timeout=0.1)
+            except Empty:
+                continue
+            if item is _DONE:
+                # Let the other consumers finish as well.
+                self.queue.put(item)
+                return
+            if isinstance(item, Exception):
+                self._error = item
+                self.stop()
+                return
+            folder, environment, criteria, created = item
+            try:
+                self.run_test(environment, criteria, created)
+            except Exception as e:
+                print(colored("Test {} could not be simulated: {}".format(criteria.name, e), "red"))
+            finally:
+                rmtree(folder, ignore_errors=True)
+                self._finish_test()
+
+    def run(self, generations=None):
+        """Runs the pipeline until the given number of generations is simulated. Blocks the calling thread.
+        :param generations: Number of generations or None to run until stop is called.
+        :return: Void.
+        """
+        self._stopped.clear()
+        self._error = None
+        self._pending = 0
+        producer = Thread(target=self._produce, args=(generations,), daemon=True)
+        consumers = [Thread(target=self._consume, daemon=True) for _ in range(self.pool.slots)]
+        producer.start()
+        for consumer in consumers:
+            consumer.start()
+        try:
+            for consumer in consumers:
+                consumer.join()
+        finally:
+            self.stop()
+            producer.join()
+            self._clear_queue()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """Stops the producer and the consumers. A running call of run returns after the current tests.
+        :return: Void.
+        """
+        self._stopped.set()
+
+    def _clear_queue(self):
+        """Removes all tests which were generated but not simulated anymore.
+        :return: Void.
+        """
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                return
+            if isinstance(item, tuple):
+                rmtree(item[0], ignore_errors=True)
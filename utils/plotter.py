@@ -1,7 +1,20 @@
-"""This file offers several plotting methods to visualize functions or roads."""
+"""This file offers several plotting methods to visualize functions or roads. Whole populations are drawn with one
+  LineCollection for the center lines and one for the width lines, no matter how many roads there are. The render
+  functions and the PlotRenderer draw on their own Agg canvas instead of the pyplot windows, so they work without a
+  display and in background threads.
+"""
+
+import os
+from math import ceil, sqrt
+from queue import Full, Queue
+from threading import Thread
 
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from termcolor import colored
 
 
 def plotter(control_points):
@@ -25,26 +38,36 @@ def plotter(control_points):
 
 
 def plot_all(population):
-    """Plots a whole population. Method starts a new figure for every individual.
+    """Plots a whole population in one figure, every individual gets its own cell of a grid.
     :param population: Population with individuals in dict form containing another dict type called control_points.
     :return: Void
     """
-    iterator = 0
-    while iterator < len(population):
-        plotter(population[iterator].get("control_points"))
-        iterator += 1
+    if len(population) == 0:
+        return
+    roads = [_as_array(individual.get("control_points")) for individual in population]
+    width = population[0].get("width")
+    figure, axes = plt.subplots()
+    plot_population(axes, roads, columns=ceil(sqrt(len(roads))), line_width=2 if width is None else width,
+                    labels=[str(index) for index in range(len(roads))])
+    axes.set_title('Road overview')
+    plt.show()
 
 
 def plot_lines(lines):
     """Plots LineStrings of the package shapely. Can be also used to plot other geometries.
-    :param lines: List of lines, e.g. LineStrings
+    :param lines: List of lines, e.g. LineStrings, or array of segments with shape (N, 2, 2).
     :return: Void
     """
-    iterator = 0
-    while iterator < len(lines):
-        x, y = lines[iterator].xy
-        plt.plot(x, y, '-og', markersize=3)
-        iterator += 1
+    if isinstance(lines, np.ndarray):
+        polylines = list(lines.reshape(-1, 2, 2))
+    else:
+        polylines = [np.column_stack(line.xy) for line in lines]
+    if len(polylines) == 0:
+        return
+    axes = plt.gca()
+    axes.add_collection(LineCollection(polylines, colors="g"))
+    vertices = np.concatenate(polylines)
+    axes.plot(vertices[:, 0], vertices[:, 1], 'og', markersize=3)
     # plt.show()
 
 
@@ -57,3 +80,194 @@ def plot_splines_and_width(width_lines, control_point_lines):
     plot_lines(width_lines)
     plot_lines(control_point_lines)
     plt.show()
+
+
+def _new_figure(width, height):
+    """Creates a figure which is not managed by pyplot and draws with Agg.
+    :param width: Width in inches.
+    :param height: Height in inches.
+    :return: Figure.
+    """
+    figure = Figure(figsize=(width, height))
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _as_array(points):
+    """Converts a list of dicts containing points into an array, arrays are returned unchanged.
+    :param points: List of dicts containing points or array of shape (N, 2).
+    :return: Array of shape (N, 2).
+    """
+    if isinstance(points, np.ndarray):
+        return points
+    return np.array([(point.get("x"), point.get("y")) for point in points], dtype=float)
+
+
+def grid_offsets(roads, columns, margin=0.1):
+    """Calculates the translations which move every road into its own cell of a grid (small multiples). All cells
+     have the size of the largest road, so all roads have the same scale.
+    :param roads: List of arrays of points with shape (N, 2), or one array with shape (K, N, 2).
+    :param columns: Number of columns.
+    :param margin: Space between the cells relative to the cell size.
+    :return: Array of translations with shape (K, 2).
+    """
+    if isinstance(roads, np.ndarray):
+        lower, upper = roads.min(axis=1), roads.max(axis=1)
+    else:
+        lower = np.array([road.min(axis=0) for road in roads])
+        upper = np.array([road.max(axis=0) for road in roads])
+    cell = (upper - lower).max(initial=1) * (1 + margin)
+    index = np.arange(len(lower))
+    origins = np.stack((index % columns, -(index // columns)), axis=1) * cell
+    # Center every road in its cell.
+    return origins - (lower + upper) / 2
+
+
+def plot_population(axes, roads, width_lines=None, columns=None, line_width=2, colors=None, labels=None):
+    """Draws a whole population with one LineCollection for the center lines and one for the width lines.
+    :param axes: Axes of the figure.
+    :param roads: List of arrays of spline samples with shape (N, 2), or one array with shape (K, N, 2).
+    :param width_lines: Optional width lines of every road, list of arrays with shape (M, 2, 2) or one array with
+                        shape (K, M, 2, 2).
+    :param columns: Number of columns of a grid of small multiples, or None to draw all roads on top of each other.
+    :param line_width: Line width of the center lines.
+    :param colors: Optional color of every road, defaults to green.
+    :param labels: Optional label of every road, only drawn in a grid.
+    :return: Array of the translations of the roads with shape (K, 2).
+    """
+    offsets = np.zeros((len(roads), 2)) if columns is None else grid_offsets(roads, columns)
+    if isinstance(roads, np.ndarray):
+        centerlines = roads + offsets[:, np.newaxis]
+    else:
+        centerlines = [road + offset for road, offset in zip(roads, offsets)]
+    axes.add_collection(LineCollection(centerlines, colors="g" if colors is None else colors,
+                                       linewidths=line_width))
+    if width_lines is not None:
+        segments = np.concatenate([np.asarray(lines).reshape(-1, 2, 2) + offset
+                                   for lines, offset in zip(width_lines, offsets)])
+        axes.add_collection(LineCollection(segments, colors="0.6", linewidths=0.5))
+    if labels is not None and columns is not None:
+        for label, road in zip(labels, centerlines):
+            axes.text(road[:, 0].min(), road[:, 1].max(), label, fontsize=8, verticalalignment="bottom")
+    axes.autoscale_view()
+    axes.set_aspect("equal", adjustable="datalim")
+    axes.set_xticks([])
+    axes.set_yticks([])
+    return offsets
+
+
+def render_road(points, path, width=None, title=None):
+    """Writes the picture of one road into a file. The format (e.g. png or svg) is taken from the file extension.
+    :param points: Array of points with shape (N, 2) or list of dicts containing points.
+    :param path: Path of the file.
+    :param width: Width of the road.
+    :param title: Optional title.
+    :return: Void.
+    """
+    figure = _new_figure(3, 3)
+    axes = figure.add_subplot()
+    plot_population(axes, [_as_array(points)], line_width=1 if width is None else width)
+    if title is not None:
+        axes.set_title(title, fontsize=8)
+    figure.savefig(path)
+
+
+def render_contact_sheet(roads, path, columns=None, titles=None):
+    """Writes the pictures of several roads as grid of small multiples into one file.
+    :param roads: List of tuples of the points (array of shape (N, 2) or list of dicts) and the width of the road
+                  (or None).
+    :param path: Path of the file, the format is taken from the file extension.
+    :param columns: Number of columns, defaults to a square grid.
+    :param titles: Optional list of labels of the roads.
+    :return: Void.
+    """
+    if len(roads) == 0:
+        return
+    if columns is None:
+        columns = ceil(sqrt(len(roads)))
+    rows = ceil(len(roads) / columns)
+    width = roads[0][1]
+    figure = _new_figure(2 * columns, 2 * rows)
+    axes = figure.add_axes((0, 0, 1, 1))
+    plot_population(axes, [_as_array(points) for points, _ in roads], columns=columns,
+                    line_width=2 if width is None else width, labels=titles)
+    figure.savefig(path)
+
+
+class PlotRenderer:
+    """Renders the roads of every generation in a background thread, so the genetic algorithm never waits for the
+     plots. Every generation gets one contact sheet and, optionally, one thumbnail per road. If the thread is too far
+     behind, the pictures of new generations are skipped.
+    """
+
+    def __init__(self, folder="plots", file_format="png", thumbnails=False, queue_size=4):
+        """
+        :param folder: Folder of the pictures, it is created if it does not exist.
+        :param file_format: File format of the pictures, e.g. "png" or "svg".
+        :param thumbnails: {@code True} to write one picture per road besides the contact sheet.
+        :param queue_size: Maximum number of generations which wait for their pictures.
+        """
+        self.folder = folder
+        self.file_format = file_format
+        self.thumbnails = thumbnails
+        self.skipped = 0
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = None
+
+    def submit(self, population, generation):
+        """Queues the pictures of a population and returns immediately.
+        :param population: List of individuals.
+        :param generation: Number of the generation, used in the file names.
+        :return: {@code True} if the pictures will be rendered, {@code False} if they were skipped.
+        """
+        # Control points of individuals are read-only arrays, so they can be passed to the thread without copying.
+        roads = [(individual.points, individual.width) for individual in population]
+        if self._thread is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._thread = Thread(target=self._render, name="PlotRenderer", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((roads, generation))
+        except Full:
+            self.skipped += 1
+            print(colored("Plots of generation {} skipped, rendering is too slow.".format(generation), "blue"))
+            return False
+        return True
+
+    def _render(self):
+        """Loop of the background thread, renders the queued generations until it gets None.
+        :return: Void.
+        """
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                roads, generation = item
+                name = "generation_{}".format(generation)
+                render_contact_sheet(roads, os.path.join(self.folder, name + "." + self.file_format),
+                                     titles=[str(index) for index in range(len(roads))])
+                if self.thumbnails:
+                    for index, (points, width) in enumerate(roads):
+                        render_road(points, os.path.join(self.folder, "{}_{}.{}".format(name, index,
+                                                                                       self.file_format)), width)
+            except Exception as e:
+                print(colored("Rendering failed: {}".format(e), "red"))
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Waits until all queued pictures are written.
+        :return: Void.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Writes the queued pictures and stops the background thread.
+        :return: Void.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
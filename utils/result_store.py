@@ -0,0 +1,163 @@
+"""This file offers a persistent store for simulation results, so roads are not simulated again in later runs."""
+
+import hashlib
+import json
+import sqlite3
+from threading import Lock
+from time import time
+
+import numpy as np
+
+
+def fingerprint(control_points, parameters, resolution=1.0):
+    """Returns the fingerprint of a road. The control points are rounded to a grid first, so tiny differences (e.g.
+     of floating point operations) do not change the fingerprint. Roads whose points are close to a cell border can
+     still get different fingerprints, ResultStore.lookup compares the points of such roads.
+    :param control_points: Array of control points with shape (N, 2).
+    :param parameters: Tuple of the parameters which change the road (e.g. the difficulty settings).
+    :param resolution: Size of the grid cells.
+    :return: SHA-256 hash as hex string.
+    """
+    grid = np.rint(np.asarray(control_points, dtype=np.float64) / resolution).astype(np.int64)
+    digest = hashlib.sha256(grid.tobytes())
+    digest.update(repr(tuple(parameters)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """SQLite database which maps road fingerprints to fitness values and the summarized traces of their simulations.
+     Repeated simulations of the same road are averaged. Lookups also find near-identical roads: roads with the same
+     number of control points whose points are all closer than {@code tolerance} to the points of a stored road.
+    """
+
+    def __init__(self, database, resolution=1.0, tolerance=1.0):
+        """
+        :param database: Path of the database file, it is created if it does not exist.
+        :param resolution: Size of the grid cells of the fingerprints.
+        :param tolerance: Maximum distance of the control points of near-identical roads. 0 only finds roads with the
+                          same fingerprint.
+        """
+        self.resolution = resolution
+        self.tolerance = tolerance
+        # Parameters -> number of control points -> tuple of a list of fingerprints and a list of point arrays.
+        # Filled from the database on the first lookup with the parameters.
+        self._roads = {}
+        self._lock = Lock()
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS results (
+                                            fingerprint TEXT PRIMARY KEY,
+                                            parameters TEXT NOT NULL,
+                                            control_points TEXT NOT NULL,
+                                            fitness REAL NOT NULL,
+                                            metrics TEXT,
+                                            simulations INTEGER NOT NULL,
+                                            updated REAL NOT NULL)""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_by_fitness ON results (parameters, fitness)")
+
+    def record(self, control_points, parameters, fitness, metrics=None):
+        """Stores the result of a simulation.
+        :param control_points: Array of control points with shape (N, 2).
+        :param parameters: Tuple of the parameters of the road.
+        :param fitness: Fitness value.
+        :param metrics: Optional dict with the metrics of the trace.
+        :return: Void.
+        """
+        key = fingerprint(control_points, parameters, self.resolution)
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT fitness, simulations FROM results WHERE fingerprint = ?",
+                                           (key,)).fetchone()
+            if row is None:
+                self._connection.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?, 1, ?)",
+                                         (key, repr(tuple(parameters)),
+                                          json.dumps(np.asarray(control_points).tolist()), fitness,
+                                          json.dumps(metrics), time()))
+                roads = self._roads.get(repr(tuple(parameters)))
+                if roads is not None:
+                    points = np.array(control_points, dtype=np.float64)
+                    keys, arrays = roads.setdefault(len(points), ([], []))
+                    keys.append(key)
+                    arrays.append(points)
+            else:
+                simulations = row[1] + 1
+                self._connection.execute("UPDATE results SET fitness = ?, metrics = ?, simulations = ?, updated = ? "
+                                         "WHERE fingerprint = ?",
+                                         ((row[0] * row[1] + fitness) / simulations, json.dumps(metrics),
+                                          simulations, time(), key))
+
+    def _nearest(self, control_points, parameters):
+        """Returns the fingerprint of the stored road which is closest to a road. The lock must be held.
+        :param control_points: Array of control points with shape (N, 2).
+        :param parameters: Tuple of the parameters of the road.
+        :return: Fingerprint or None if no stored road is closer than the tolerance.
+        """
+        name = repr(tuple(parameters))
+        roads = self._roads.get(name)
+        if roads is None:
+            roads = {}
+            for key, points in self._connection.execute("SELECT fingerprint, control_points FROM results "
+                                                        "WHERE parameters = ?", (name,)):
+                points = np.array(json.loads(points), dtype=np.float64)
+                keys, arrays = roads.setdefault(len(points), ([], []))
+                keys.append(key)
+                arrays.append(points)
+            self._roads[name] = roads
+        points = np.asarray(control_points, dtype=np.float64)
+        keys, arrays = roads.get(len(points), ((), ()))
+        if len(keys) == 0:
+            return None
+        distances = np.linalg.norm(np.stack(arrays) - points, axis=2).max(axis=1)
+        index = int(np.argmin(distances))
+        return keys[index] if distances[index] < self.tolerance else None
+
+    def lookup(self, control_points, parameters):
+        """Returns the stored result of a road or of the closest near-identical road.
+        :param control_points: Array of control points with shape (N, 2).
+        :param parameters: Tuple of the parameters of the road.
+        :return: Dict with fitness, metrics and number of simulations, or None if the road was never simulated.
+        """
+        key = fingerprint(control_points, parameters, self.resolution)
+        query = "SELECT fitness, metrics, simulations FROM results WHERE fingerprint = ?"
+        with self._lock:
+            row = self._connection.execute(query, (key,)).fetchone()
+            if row is None and self.tolerance > 0:
+                key = self._nearest(control_points, parameters)
+                if key is not None:
+                    row = self._connection.execute(query, (key,)).fetchone()
+        if row is None:
+            return None
+        return {"fitness": row[0], "metrics": json.loads(row[1]), "simulations": row[2]}
+
+    def best(self, parameters, limit):
+        """Returns the best roads which were simulated with the given parameters. Like the elites of the genetic
+         algorithm, roads with higher fitness values (more critical roads) come first.
+        :param parameters: Tuple of the parameters of the roads.
+        :param limit: Maximum number of roads.
+        :return: List of tuples of the control points as array of shape (N, 2) and the fitness value.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT control_points, fitness FROM results WHERE parameters = ? "
+                                            "ORDER BY fitness DESC LIMIT ?", (repr(tuple(parameters)), limit)).fetchall()
+        return [(np.array(json.loads(points), dtype=np.float64), fitness) for points, fitness in rows]
+
+    def history(self, parameters=None):
+        """Returns all stored results, e.g. to train a model of the fitness.
+        :param parameters: Tuple of parameters to return only the results of these parameters, or None for all.
+        :return: List of tuples of the control points as array of shape (N, 2), the fitness value and the metrics.
+        """
+        query = "SELECT control_points, fitness, metrics FROM results"
+        arguments = ()
+        if parameters is not None:
+            query += " WHERE parameters = ?"
+            arguments = (repr(tuple(parameters)),)
+        with self._lock:
+            rows = self._connection.execute(query, arguments).fetchall()
+        return [(np.array(json.loads(points), dtype=np.float64), fitness, json.loads(metrics))
+                for points, fitness, metrics in rows]
+
+    def close(self):
+        """Closes the database.
+        :return: Void.
+        """
+        with self._lock:
+            self._connection.close()
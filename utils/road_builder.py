@@ -0,0 +1,160 @@
+"""This file offers an incremental road builder, which validates a road while control points are appended."""
+
+import numpy as np
+
+from utils.bspline import basis_matrix, clip_degree
+from utils.validity_checks import SegmentIndex, as_point_array, intersection_check_last, lines_to_segments, \
+    points_to_segments
+
+
+def _pairs_with_gap(query, indexed, offset):
+    """Checks whether any intersecting pair belongs to two non-adjacent segments.
+    :param query: Indices of the query segments.
+    :param indexed: Indices of the indexed segments.
+    :param offset: Global index of the first query segment.
+    :return: {@code True} if two non-adjacent segments intersect, {@code False} if not.
+    """
+    return bool((np.abs(query + offset - indexed) >= 2).any())
+
+
+class _RoadState:
+    """Cached validation data of an accepted road. Everything up to sample {@code stable} stays the same when
+     another control point with the same spline degree is appended.
+    """
+    __slots__ = ("degree", "stable", "samples", "segment_index", "width_index", "width_hits")
+
+    def __init__(self, degree, stable, samples, segment_index, width_index, width_hits):
+        self.degree = degree
+        self.stable = stable
+        self.samples = samples
+        self.segment_index = segment_index
+        self.width_index = width_index
+        self.width_hits = width_hits
+
+
+class RoadBuilder:
+    """Builds a road by appending control points one by one. A b-spline has local support, so appending a
+     control point only changes the last spans of the spline. The builder keeps the samples, segments and
+     width lines of the unchanged prefix and evaluates and checks only the new tail of the road.
+     Samples are placed at a fixed density per knot span, so the samples of the prefix never move.
+    """
+
+    def __init__(self, control_points, degree, width_lines, samples_per_span=10, on_spline_evaluation=None):
+        """
+        :param control_points: Valid start of the road as array-like of shape (N, 2). Needs at least two points.
+        :param degree: Desired spline degree (sharpness of curves).
+        :param width_lines: Function which returns the width lines of an array of spline samples.
+        :param samples_per_span: Number of spline samples between two knots.
+        :param on_spline_evaluation: Optional function without parameters which is called for every evaluation of
+                                     the spline (tail), e.g. to count the evaluations.
+        """
+        self.spline_degree = degree
+        self.samples_per_span = samples_per_span
+        self._width_lines = width_lines
+        self._on_spline_evaluation = on_spline_evaluation
+        self._points = as_point_array(control_points)
+        self._history = []
+        self.rejection = None
+        self._state = self._evaluate(self._points, None)[0]
+
+    def __len__(self):
+        return len(self._points)
+
+    @property
+    def points(self):
+        """Returns the control points of the current road as array of shape (N, 2)."""
+        return self._points
+
+    @property
+    def spline(self):
+        """Returns the spline samples of the current road as array of shape (N, 2)."""
+        return self._state.samples
+
+    def _evaluate(self, points, state):
+        """Evaluates the tail of the spline and checks it against the cached prefix.
+        :param points: All control points including the new one as array of shape (N, 2).
+        :param state: Cached state of the road without the new point, or {@code None} for a full evaluation.
+        :return: Tuple of the new state and the name of the failed check ("spline_intersection_check" or
+                 "intersection_check_width"), or None if the road is valid.
+        """
+        count = len(points)
+        degree = clip_degree(self.spline_degree, count)
+        if state is None or state.degree != degree:
+            start = 0
+            prefix_segments = np.zeros((0, 2, 2))
+            prefix_widths = np.zeros((0, 2, 2))
+            segment_index = SegmentIndex(prefix_segments)
+            width_index = SegmentIndex(prefix_widths)
+            width_hits = np.zeros(0, dtype=int)
+        else:
+            start = state.stable
+            prefix_segments = state.segment_index.segments
+            prefix_widths = state.width_index.segments
+            segment_index = state.segment_index
+            width_index = state.width_index
+            width_hits = state.width_hits
+
+        # Evaluate only the samples behind the stable prefix.
+        sample_count = (count - degree) * self.samples_per_span + 1
+        tail = basis_matrix(count, degree, sample_count)[start:] @ points
+        if self._on_spline_evaluation is not None:
+            self._on_spline_evaluation()
+        if start > 0:
+            tail[0] = state.samples[start]
+            samples = np.concatenate((state.samples[:start], tail))
+        else:
+            samples = tail
+        tail_segments = points_to_segments(tail)
+        tail_widths = lines_to_segments(self._width_lines(tail))
+        tail_index = SegmentIndex(tail_segments)
+
+        # Road must not intersect itself. Neighbouring segments always touch each other.
+        if (_pairs_with_gap(*segment_index.intersections(tail_segments), start)
+                or _pairs_with_gap(*tail_index.intersections(tail_segments), 0)):
+            return None, "spline_intersection_check"
+
+        # Width lines may only intersect the segments next to their origin.
+        new_segment, old_width = width_index.intersections(tail_segments)
+        new_width, old_segment = segment_index.intersections(tail_widths)
+        tail_width, tail_segment = tail_index.intersections(tail_widths)
+        widths = np.concatenate((new_width + start, old_width, tail_width + start))
+        segments = np.concatenate((old_segment, new_segment + start, tail_segment + start))
+        hits = np.bincount(widths, minlength=len(samples)) + np.pad(width_hits, (0, len(samples) - start))
+        if (hits >= 3).any():
+            return None, "intersection_check_width"
+
+        # Cache everything which stays the same when the next point gets appended.
+        stable = max(0, count - 2 * degree) * self.samples_per_span
+        all_segments = np.concatenate((prefix_segments, tail_segments))
+        all_widths = np.concatenate((prefix_widths, tail_widths))
+        inside = (widths < stable) & (segments < stable)
+        stable_hits = np.pad(width_hits, (0, stable - start)) + np.bincount(widths[inside], minlength=stable)
+        new_state = _RoadState(degree, stable, samples, SegmentIndex(all_segments[:stable]),
+                               SegmentIndex(all_widths[:stable]), stable_hits)
+        return new_state, None
+
+    def try_append(self, point):
+        """Appends a new control point if the resulting road is still valid. The name of the check which rejected the
+         point is stored in {@code rejection}.
+        :param point: New point as (x, y) pair.
+        :return: {@code True} if the point was appended, {@code False} if the road would become invalid.
+        """
+        if intersection_check_last(self._points, point):
+            self.rejection = "intersection_check_last"
+            return False
+        points = np.concatenate((self._points, as_point_array([point])))
+        state, self.rejection = self._evaluate(points, self._state)
+        if self.rejection is not None:
+            return False
+        self._history.append((self._points, self._state))
+        self._points = points
+        self._state = state
+        return True
+
+    def pop(self):
+        """Removes the last appended control point and restores the cached state before it was added.
+        :return: Removed point as array of shape (2,).
+        """
+        point = self._points[-1]
+        self._points, self._state = self._history.pop()
+        return point
@@ -0,0 +1,153 @@
+"""This file offers a content-addressed cache for rendered test files and measured fitness values. Roads which
+  survive a generation unchanged (like the elites) are neither splined, rendered nor simulated again.
+"""
+
+import hashlib
+import json
+import os
+from os import path
+
+import numpy as np
+
+from utils.files import write_file
+
+# Placeholders for the parts of a dbc file which change with the position of the road in the population.
+_ENVIRONMENT = b"<environment>{environment}</environment>"
+_NAME = b"<name>{name}</name>"
+
+
+def scenario_key(control_points, parameters, samples):
+    """Returns the key of a road. Equal roads with equal parameters get the same key.
+    :param control_points: Array of control points with shape (N, 2).
+    :param parameters: Tuple of all parameters which change the rendered files (e.g. the difficulty settings).
+    :param samples: Number of spline samples.
+    :return: SHA-256 hash as hex string.
+    """
+    digest = hashlib.sha256(np.ascontiguousarray(control_points, dtype=np.float64).tobytes())
+    digest.update(repr((tuple(parameters), samples)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ScenarioCache:
+    """Stores the dbe and dbc file and the fitness of roads on disk. If the files take more than {@code max_bytes},
+     the least recently used entries are removed.
+    """
+
+    def __init__(self, folder, max_bytes=256 * 1024 * 1024):
+        """
+        :param folder: Folder of the cache, it is created if it does not exist.
+        :param max_bytes: Maximum size of all cached files.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+        self._index_path = path.join(folder, "index.json")
+        self._index = {}
+        if path.exists(self._index_path):
+            with open(self._index_path, "r") as f:
+                self._index = json.load(f)
+        self._clock = max([entry["used"] for entry in self._index.values()], default=0)
+        self.size = sum(entry["size"] for entry in self._index.values())
+
+    def _touch(self, entry):
+        self._clock += 1
+        entry["used"] = self._clock
+
+    def _save_index(self):
+        write_file(self._index_path, json.dumps(self._index).encode("utf-8"))
+
+    def get(self, key):
+        """Returns a cached entry and marks it as recently used.
+        :param key: Key of the road, see scenario_key.
+        :return: Dict with the fitness and metrics (None if the road was not simulated yet) or None if the road is not
+                 cached.
+        """
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        self._touch(entry)
+        return entry
+
+    def files(self, key, file_name, name):
+        """Returns the cached files of a road.
+        :param key: Key of the road.
+        :param file_name: Name of the files without extension, e.g. "exampleTest3".
+        :param name: Name of the test.
+        :return: Dict with the file names as keys and the contents as bytes as values, or None if the road is not
+                 cached.
+        """
+        if key not in self._index:
+            return None
+        try:
+            with open(path.join(self.folder, key + ".dbe.xml"), "rb") as f:
+                dbe = f.read()
+            with open(path.join(self.folder, key + ".dbc.xml"), "rb") as f:
+                dbc = f.read()
+        except FileNotFoundError:
+            self._remove(key)
+            return None
+        dbc = dbc.replace(_ENVIRONMENT, _ENVIRONMENT.replace(b"{environment}", (file_name + ".dbe.xml").encode()))
+        dbc = dbc.replace(_NAME, _NAME.replace(b"{name}", name.encode()))
+        return {file_name + ".dbe.xml": dbe, file_name + ".dbc.xml": dbc}
+
+    def put(self, key, files, file_name, name):
+        """Stores the rendered files of a road.
+        :param key: Key of the road.
+        :param files: Dict with the file names as keys and the contents as bytes as values, see render_xml.
+        :param file_name: Name of the files without extension, which is replaced by a placeholder.
+        :param name: Name of the test, which is replaced by a placeholder.
+        :return: Void.
+        """
+        dbe = files[file_name + ".dbe.xml"]
+        dbc = files[file_name + ".dbc.xml"]
+        dbc = dbc.replace(_ENVIRONMENT.replace(b"{environment}", (file_name + ".dbe.xml").encode()), _ENVIRONMENT)
+        dbc = dbc.replace(_NAME.replace(b"{name}", name.encode()), _NAME)
+        write_file(path.join(self.folder, key + ".dbe.xml"), dbe)
+        write_file(path.join(self.folder, key + ".dbc.xml"), dbc)
+        old = self._index.get(key)
+        if old is not None:
+            self.size -= old["size"]
+        entry = {"size": len(dbe) + len(dbc), "used": 0, "fitness": None, "metrics": None}
+        if old is not None:
+            entry["fitness"] = old["fitness"]
+            entry["metrics"] = old["metrics"]
+        self._touch(entry)
+        self._index[key] = entry
+        self.size += entry["size"]
+        self._evict()
+        self._save_index()
+
+    def put_result(self, key, fitness, metrics=None):
+        """Stores the measured fitness of a cached road.
+        :param key: Key of the road.
+        :param fitness: Fitness value.
+        :param metrics: Optional dict with the metrics of the trace.
+        :return: Void.
+        """
+        entry = self._index.get(key)
+        if entry is None:
+            return
+        entry["fitness"] = fitness
+        entry["metrics"] = metrics
+        self._touch(entry)
+        self._save_index()
+
+    def _remove(self, key):
+        entry = self._index.pop(key)
+        self.size -= entry["size"]
+        for extension in (".dbe.xml", ".dbc.xml"):
+            try:
+                os.remove(path.join(self.folder, key + extension))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache is small enough.
+        :return: Void.
+        """
+        if self.size <= self.max_bytes:
+            return
+        for key in sorted(self._index, key=lambda k: self._index[k]["used"]):
+            if self.size <= self.max_bytes:
+                break
+            self._remove(key)
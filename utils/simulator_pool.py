@@ -0,0 +1,165 @@
+"""This file offers a pool of DriveBuild endpoints, so the tests of a generation can be simulated on several
+  SimNodes at once.
+"""
+
+from threading import Condition
+from time import monotonic
+
+from drivebuildclient.AIExchangeService import AIExchangeService
+from termcolor import colored
+
+
+class SimulatorError(Exception):
+    """Raised when a DriveBuild endpoint can not run a test, e.g. because the upload failed."""
+
+
+class SimulatorNode:
+    """One DriveBuild endpoint with its service client and the simulations which are currently running on it."""
+
+    def __init__(self, service, name):
+        """
+        :param service: AIExchangeService of this endpoint. It is reused for every request.
+        :param name: Name of this endpoint for messages, e.g. "localhost:8383".
+        """
+        self.service = service
+        self.name = name
+        self.running = 0
+        self.in_flight = set()
+        self.failures = 0
+        self.available_at = 0
+
+    def call(self, method, *args):
+        """Calls a method of the service. Connection errors are raised as SimulatorError, so the pool can tell them
+         apart from errors of the caller.
+        :param method: Name of the method, e.g. "run_tests".
+        :param args: Arguments of the method.
+        :return: Return value of the method.
+        """
+        try:
+            return getattr(self.service, method)(*args)
+        except OSError as e:
+            raise SimulatorError("{} on {} failed: {}".format(method, self.name, e)) from e
+
+
+class SimulatorPool:
+    """Distributes tests over several DriveBuild endpoints. Each endpoint runs at most {@code capacity} tests at once.
+     An endpoint which fails (raises a SimulatorError) is not used for {@code cooldown} seconds and the test is
+     retried on another endpoint.
+    """
+
+    def __init__(self, services, capacity=1, retries=2, cooldown=30):
+        """
+        :param services: List of AIExchangeServices (or objects with the same methods), one per endpoint.
+        :param capacity: Number of tests each endpoint runs at the same time.
+        :param retries: Number of times a failed test is tried again on another endpoint.
+        :param cooldown: Seconds an endpoint is not used after it failed.
+        """
+        self.nodes = [SimulatorNode(service, "{}:{}".format(getattr(service, "host", "node"),
+                                                            getattr(service, "port", index)))
+                      for index, service in enumerate(services)]
+        self.capacity = capacity
+        self.retries = retries
+        self.cooldown = cooldown
+        self._condition = Condition()
+
+    @classmethod
+    def from_endpoints(cls, endpoints, **kwargs):
+        """Creates a pool with one service client per endpoint.
+        :param endpoints: List of (host, port) tuples.
+        :param kwargs: See __init__.
+        :return: SimulatorPool.
+        """
+        return cls([AIExchangeService(host, port) for host, port in endpoints], **kwargs)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def slots(self):
+        """Returns the number of tests which can run at the same time."""
+        return len(self.nodes) * self.capacity
+
+    def acquire(self, exclude=()):
+        """Blocks until an endpoint can run another test and reserves it. Endpoints with fewer running tests are
+         preferred, so the tests are spread evenly.
+        :param exclude: Endpoints which should only be used if no other endpoint is available.
+        :return: SimulatorNode.
+        """
+        with self._condition:
+            while True:
+                now = monotonic()
+                free = [node for node in self.nodes if node.running < self.capacity and node.available_at <= now]
+                preferred = [node for node in free if node not in exclude] or free
+                if preferred:
+                    node = min(preferred, key=lambda n: n.running)
+                    node.running += 1
+                    return node
+                cooling = [node.available_at - now for node in self.nodes if node.available_at > now]
+                self._condition.wait(timeout=min(cooling) if cooling else None)
+
+    def release(self, node, failed=False):
+        """Frees a reserved endpoint.
+        :param node: SimulatorNode returned by acquire.
+        :param failed: {@code True} if the endpoint failed and should not be used for a while.
+        :return: Void.
+        """
+        with self._condition:
+            node.running -= 1
+            if failed:
+                node.failures += 1
+                node.available_at = monotonic() + self.cooldown
+            else:
+                node.failures = 0
+            self._condition.notify_all()
+
+    def track(self, node, sid):
+        """Remembers a running simulation of an endpoint.
+        :param node: SimulatorNode.
+        :param sid: Simulation ID.
+        :return: Void.
+        """
+        with self._condition:
+            node.in_flight.add(sid.sid)
+
+    def untrack(self, node, sid):
+        """Forgets a finished simulation of an endpoint.
+        :param node: SimulatorNode.
+        :param sid: Simulation ID.
+        :return: Void.
+        """
+        with self._condition:
+            node.in_flight.discard(sid.sid)
+
+    def in_flight(self):
+        """Returns the running simulations of every endpoint.
+        :return: Dict with the endpoint names as keys and lists of simulation IDs as values.
+        """
+        with self._condition:
+            return {node.name: sorted(node.in_flight) for node in self.nodes}
+
+    def run(self, function):
+        """Runs a function on an endpoint and retries it on other endpoints if the endpoint fails. Only a
+         SimulatorError counts as failure of the endpoint, all other exceptions are raised without retry.
+        :param function: Function which gets a SimulatorNode.
+        :return: Return value of the function.
+        """
+        failed_nodes = []
+        while True:
+            node = self.acquire(exclude=failed_nodes)
+            try:
+                result = function(node)
+            except SimulatorError as e:
+                self.release(node, failed=True)
+                with self._condition:
+                    lost = sorted(node.in_flight)
+                    node.in_flight.clear()
+                print(colored("Simulator {} failed: {} (lost simulations: {})".format(node.name, e, lost), "red"))
+                failed_nodes.append(node)
+                if len(failed_nodes) > self.retries:
+                    raise
+                continue
+            except BaseException:
+                self.release(node)
+                raise
+            self.release(node)
+            return result
@@ -0,0 +1,80 @@
+"""This file offers a cheap estimate of the fitness of a road, so only the most promising new roads are simulated."""
+
+import numpy as np
+
+# Radius (relative to the street width) from which on a curve counts as straight.
+MAX_RADIUS_RATIO = 10
+# Number of stored results needed before the regression replaces the geometric estimate.
+MIN_TRAINING_SAMPLES = 8
+
+
+def road_features(spline, width):
+    """Returns the geometric features of a road.
+    :param spline: Array of spline samples with shape (N, 2), N >= 3.
+    :param width: Width of the street.
+    :return: Array with a constant 1, the maximum curvature, the total turning angle in radians and the minimum curve
+             radius relative to the street width (at most MAX_RADIUS_RATIO).
+    """
+    directions = np.diff(np.asarray(spline, dtype=float), axis=0)
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    headings = np.arctan2(directions[:, 1], directions[:, 0])
+    turns = np.abs((np.diff(headings) + np.pi) % (2 * np.pi) - np.pi)
+
+    # The turn between two segments is spread over half of both segments.
+    arc_lengths = (lengths[:-1] + lengths[1:]) / 2
+    curvature = np.divide(turns, arc_lengths, out=np.zeros_like(turns), where=arc_lengths > 0)
+    max_curvature = curvature.max(initial=0)
+    radius_ratio = MAX_RADIUS_RATIO if max_curvature == 0 else min(MAX_RADIUS_RATIO, 1 / max_curvature / width)
+    return np.array([1.0, max_curvature, turns.sum(), radius_ratio])
+
+
+class SurrogateModel:
+    """Ranks roads by their estimated fitness. Without training the estimate only depends on how sharp and how many
+     curves a road has, after training it is a linear regression of the fitness on the road features.
+    """
+
+    def __init__(self, top_k=4):
+        """
+        :param top_k: Number of new roads which are simulated per generation.
+        """
+        self.top_k = top_k
+        self.weights = None
+
+    def fit(self, splines, fitness, width):
+        """Trains the regression with simulated roads. Does nothing if there are less than MIN_TRAINING_SAMPLES roads.
+        :param splines: List of arrays of spline samples.
+        :param fitness: List of the measured fitness values.
+        :param width: Width of the street.
+        :return: {@code True} if the model was trained, {@code False} otherwise.
+        """
+        if len(splines) < MIN_TRAINING_SAMPLES:
+            return False
+        features = np.array([road_features(spline, width) for spline in splines])
+        self.weights = np.linalg.lstsq(features, np.asarray(fitness, dtype=float), rcond=None)[0]
+        return True
+
+    def predict(self, splines, width):
+        """Estimates the fitness of roads. Higher values mean the AI is expected to leave the road center more often.
+        :param splines: List of arrays of spline samples.
+        :param width: Width of the street.
+        :return: Array of estimated fitness values.
+        """
+        features = np.array([road_features(spline, width) for spline in splines]).reshape(-1, 4)
+        if self.weights is not None:
+            return features @ self.weights
+        # Sharp curves (small radius) and many curves (large turning angle) make a road harder.
+        return (MAX_RADIUS_RATIO - features[:, 3]) / MAX_RADIUS_RATIO + features[:, 2] / (2 * np.pi)
+
+    def select(self, splines, width, count=None):
+        """Returns the roads which should be simulated. Higher fitness values mean more critical roads, so the roads
+         with the highest estimates are selected.
+        :param splines: List of arrays of spline samples.
+        :param width: Width of the street.
+        :param count: Number of selected roads, defaults to top_k.
+        :return: Tuple of the sorted indices of the selected roads and all estimates.
+        """
+        if count is None:
+            count = self.top_k
+        estimates = self.predict(splines, width)
+        order = np.argsort(-estimates, kind="stable")
+        return np.sort(order[:count]), estimates
@@ -0,0 +1,78 @@
+"""This file offers the processing of simulation traces, which are used to determine the fitness of a road."""
+
+import numpy as np
+
+
+class TraceBuffer:
+    """Collects the distances of the ego car to the road center. The records are written into a preallocated buffer
+     and folded into running metrics whenever the buffer is full, so the buffer does not grow with the length of the
+     trace. This does not bound the memory of a simulation: AIExchangeService.get_trace returns the whole trace at
+     once, only the records are not copied a second time.
+    """
+
+    def __init__(self, threshold=1.0, steps_per_second=60, capacity=4096):
+        """
+        :param threshold: Distance to the road center which counts as critical.
+        :param steps_per_second: Simulation steps per second, used to turn ticks into seconds.
+        :param capacity: Number of records which are buffered before they are processed.
+        """
+        self.threshold = threshold
+        self.steps_per_second = steps_per_second
+        self._buffer = np.empty((capacity, 2))
+        self._size = 0
+        self.count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._ticks_over_threshold = 0.0
+        self._last = None
+
+    def append(self, tick, distance):
+        """Adds one record.
+        :param tick: Simulation tick of the record.
+        :param distance: Distance to the road center.
+        :return: Void.
+        """
+        self._buffer[self._size] = tick, distance
+        self._size += 1
+        if self._size == len(self._buffer):
+            self._flush()
+
+    def extend(self, trace_data):
+        """Adds the records of a trace as returned by AIExchangeService.get_trace.
+        :param trace_data: Iterable of trace records (tuples with the tick at index 2 and the data at index 3).
+        :return: Void.
+        """
+        for record in trace_data:
+            self.append(record[2], record[3].data["egoLaneDist"].road_center_distance.distance)
+
+    def _flush(self):
+        """Folds the buffered records into the metrics and empties the buffer.
+        :return: Void.
+        """
+        if self._size == 0:
+            return
+        ticks = self._buffer[:self._size, 0]
+        distances = self._buffer[:self._size, 1]
+        self.count += self._size
+        self._sum += distances.sum()
+        self._max = max(self._max, distances.max())
+
+        # A record lasts until the next one, so the last record of the buffer is kept for the next call.
+        if self._last is not None:
+            ticks = np.concatenate(([self._last[0]], ticks))
+            distances = np.concatenate(([self._last[1]], distances))
+        self._ticks_over_threshold += np.diff(ticks)[distances[:-1] > self.threshold].sum()
+        self._last = ticks[-1], distances[-1]
+        self._size = 0
+
+    def metrics(self):
+        """Returns the metrics of all added records.
+        :return: Dict with the mean and maximum distance to the road center, the seconds spent over the threshold,
+                 the simulated seconds and the sum of all distances.
+        """
+        self._flush()
+        return {"mean_distance": float(self._sum / self.count) if self.count > 0 else 0.0,
+                "max_distance": float(self._max),
+                "time_over_threshold": float(self._ticks_over_threshold / self.steps_per_second),
+                "duration": float(self._last[0] / self.steps_per_second) if self._last is not None else 0.0,
+                "cumulative_distance": float(self._sum)}
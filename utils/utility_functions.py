@@ -16,6 +16,14 @@ def convert_points_to_lines(control_points):
         iterator += 1
     return control_points_lines
 
+
+def convert_segments_to_lines(segments):
+    """Turns an array of segments (e.g. width lines) into a list of LineStrings.
+    :param segments: Array of shape (N, 2, 2).
+    :return: List of LineStrings.
+    """
+    return [LineString(segment) for segment in segments]
+
 """def convert_points_to_lines(control_points):
     control_points_lines = []
     iterator = 0
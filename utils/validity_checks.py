@@ -1,6 +1,149 @@
 """This file offers various validity methods to check for intersections."""
 
-from shapely.geometry import LineString
+import numpy as np
+
+
+def as_point_array(points):
+    """Converts a list of points to a numpy array of shape (N, 2).
+    :param points: List of dicts containing points or an array-like of coordinates.
+    :return: Numpy array of shape (N, 2).
+    """
+    if len(points) > 0 and isinstance(points[0], dict):
+        return np.array([(point.get("x"), point.get("y")) for point in points], dtype=float)
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def points_to_segments(points):
+    """Turns consecutive points into segments.
+    :param points: Array-like of shape (N, 2) or list of dicts containing points.
+    :return: Numpy array of shape (N - 1, 2, 2), one start and end point per segment.
+    """
+    points = as_point_array(points)
+    return np.stack((points[:-1], points[1:]), axis=1)
+
+
+def lines_to_segments(lines):
+    """Converts a list of two point lines (e.g. LineStrings) to a segment array.
+    :param lines: List of lines or an array of shape (N, 2, 2).
+    :return: Numpy array of shape (N, 2, 2).
+    """
+    if isinstance(lines, np.ndarray):
+        return lines.astype(float, copy=False).reshape(-1, 2, 2)
+    return np.array([line.coords[:] for line in lines], dtype=float).reshape(-1, 2, 2)
+
+
+def _orientation(p, q, r):
+    """Returns the orientation of the point triple (p, q, r).
+    :return: 1 for counter-clockwise, -1 for clockwise and 0 for collinear points.
+    """
+    return np.sign((q[..., 0] - p[..., 0]) * (r[..., 1] - p[..., 1])
+                   - (q[..., 1] - p[..., 1]) * (r[..., 0] - p[..., 0]))
+
+
+def _on_segment(p, q, r):
+    """Checks whether r lies within the bounding box of the segment pq. Only meaningful for collinear points."""
+    return ((np.minimum(p[..., 0], q[..., 0]) <= r[..., 0]) & (r[..., 0] <= np.maximum(p[..., 0], q[..., 0]))
+            & (np.minimum(p[..., 1], q[..., 1]) <= r[..., 1]) & (r[..., 1] <= np.maximum(p[..., 1], q[..., 1])))
+
+
+def segments_intersect(segments_a, segments_b):
+    """Checks pairs of segments for intersections. Touching and overlapping segments count as
+     intersecting, just like {@code LineString.intersects}, while segments of zero length never
+     intersect anything (again like Shapely). Both arguments are broadcast against
+     each other, so segments_a[:, np.newaxis] and segments_b[np.newaxis] test all pairs at once.
+    :param segments_a: Array of shape (..., 2, 2).
+    :param segments_b: Array of shape (..., 2, 2).
+    :return: Boolean array with the broadcast shape of both arguments (without the last two axes).
+    """
+    a = np.asarray(segments_a, dtype=float)
+    b = np.asarray(segments_b, dtype=float)
+    a1, a2 = a[..., 0, :], a[..., 1, :]
+    b1, b2 = b[..., 0, :], b[..., 1, :]
+    o1 = _orientation(a1, a2, b1)
+    o2 = _orientation(a1, a2, b2)
+    o3 = _orientation(b1, b2, a1)
+    o4 = _orientation(b1, b2, a2)
+    general = (o1 != o2) & (o3 != o4)
+    collinear = (((o1 == 0) & _on_segment(a1, a2, b1)) | ((o2 == 0) & _on_segment(a1, a2, b2))
+                 | ((o3 == 0) & _on_segment(b1, b2, a1)) | ((o4 == 0) & _on_segment(b1, b2, a2)))
+    degenerate = np.all(a1 == a2, axis=-1) | np.all(b1 == b2, axis=-1)
+    return (general | collinear) & ~degenerate
+
+
+def intersection_matrix(segments_a, segments_b):
+    """Checks every segment of the first array against every segment of the second one.
+    :param segments_a: Array of shape (N, 2, 2).
+    :param segments_b: Array of shape (M, 2, 2).
+    :return: Boolean array of shape (N, M).
+    """
+    segments_a = np.asarray(segments_a, dtype=float).reshape(-1, 2, 2)
+    segments_b = np.asarray(segments_b, dtype=float).reshape(-1, 2, 2)
+    return segments_intersect(segments_a[:, np.newaxis], segments_b[np.newaxis])
+
+
+class SegmentIndex:
+    """Broad phase for intersection tests. Segments are sorted by the left edge of their bounding
+     box (sweep and prune along the x-axis), so a query only runs the exact test on segments whose
+     bounding boxes overlap the queried ones instead of on every pair.
+    """
+
+    def __init__(self, segments):
+        """
+        :param segments: Array of shape (N, 2, 2) which should be indexed.
+        """
+        self.segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+        self.mins = self.segments.min(axis=1)
+        self.maxs = self.segments.max(axis=1)
+        self._order = np.argsort(self.mins[:, 0], kind="stable")
+        self._sorted_x_min = self.mins[self._order, 0]
+        self._max_extent = (self.maxs[:, 0] - self.mins[:, 0]).max() if len(self.segments) > 0 else 0
+
+    def __len__(self):
+        return len(self.segments)
+
+    def candidates(self, segments):
+        """Returns all pairs of query and indexed segments with overlapping bounding boxes.
+        :param segments: Array of shape (M, 2, 2) with query segments.
+        :return: Tuple of two index arrays (query indices, indexed segment indices).
+        """
+        segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+        if len(segments) == 0 or len(self.segments) == 0:
+            empty = np.zeros(0, dtype=int)
+            return empty, empty
+        mins = segments.min(axis=1)
+        maxs = segments.max(axis=1)
+
+        # Every indexed segment starting in [x_min - max_extent, x_max] can overlap on the x-axis.
+        starts = np.searchsorted(self._sorted_x_min, mins[:, 0] - self._max_extent, side="left")
+        ends = np.searchsorted(self._sorted_x_min, maxs[:, 0], side="right")
+        counts = ends - starts
+        query = np.repeat(np.arange(len(segments)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        indexed = self._order[np.repeat(starts, counts) + offsets]
+
+        overlap = ((self.mins[indexed] <= maxs[query]) & (mins[query] <= self.maxs[indexed])).all(axis=1)
+        return query[overlap], indexed[overlap]
+
+    def intersections(self, segments):
+        """Returns all pairs of query and indexed segments which intersect.
+        :param segments: Array of shape (M, 2, 2) with query segments.
+        :return: Tuple of two index arrays (query indices, indexed segment indices).
+        """
+        segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+        query, indexed = self.candidates(segments)
+        hits = segments_intersect(segments[query], self.segments[indexed])
+        return query[hits], indexed[hits]
+
+
+def _self_intersects(segments):
+    """Checks whether any two non-adjacent segments of a polyline intersect.
+    :param segments: Array of shape (N, 2, 2).
+    :return: {@code True} if two segments intersect, {@code False} if not.
+    """
+    if len(segments) < 3:
+        return False
+    query, indexed = SegmentIndex(segments).intersections(segments)
+    return bool((indexed - query >= 2).any())
 
 
 def intersection_check_last(control_points, point):
@@ -10,62 +153,48 @@ def intersection_check_last(control_points, point):
     :param point: Last inserted point, which should be checked for validity.
     :return: {@code True} if the last line intersects with another one, {@code False} if not.
     """
-    iterator = 0
-    while iterator <= (len(control_points) - 3):
-        p1 = (control_points[iterator].get("x"), control_points[iterator].get("y"))
-        p2 = (control_points[iterator + 1].get("x"), control_points[iterator + 1].get("y"))
-        line1 = LineString([p1, p2])
-        p3 = (control_points[-1].get("x"), control_points[-1].get("y"))
-        tmp_point = (point.get("x"), point.get("y"))
-        line2 = LineString([p3, tmp_point])
-        if line1.intersects(line2):
-            return True
-        iterator += 1
-    return False
+    return bool(intersection_check_last_batch(control_points, [point])[0])
+
+
+def intersection_check_last_batch(control_points, points):
+    """Checks several candidates for the next control point at once. See intersection_check_last.
+    :param control_points: List of dicts containing points or array of shape (N, 2).
+    :param points: Candidates for the next point as array of shape (K, 2).
+    :return: Boolean array of shape (K,) which is {@code True} where the new line intersects another one.
+    """
+    points = as_point_array(points)
+    if len(control_points) < 3:
+        return np.zeros(len(points), dtype=bool)
+    control_points = as_point_array(control_points)
+    new_lines = np.stack((np.broadcast_to(control_points[-1], points.shape), points), axis=1)
+    return intersection_matrix(new_lines, points_to_segments(control_points)[:-1]).any(axis=1)
 
 
 def intersection_check_width(width_lines, control_points_lines):
     """Checks for intersections between the width lines of a control point and
      any other line between two control points.
-    :param width_lines: Width lines of a control point (e.g. LineString). They should be flipped
-                        by 90 degrees and in a list form.
-    :param control_points_lines: List of lines between two control points (e.g. LineStrings).
+    :param width_lines: Width lines of a control point (e.g. LineString or array of shape (N, 2, 2)). They should
+                        be flipped by 90 degrees and in a list form.
+    :param control_points_lines: List of lines between two control points (e.g. LineStrings or array of shape
+                                 (M, 2, 2)).
     :return: {@code True} if two lines intersect, {@code False} if no line intersect.
     """
-    iterator = 0
-    while iterator < len(width_lines):
-        intersections = 0
-        jterator = 0
-        while jterator < len(control_points_lines):
-            if width_lines[iterator].intersects(control_points_lines[jterator]):
-                intersections += 1
-            # One line intersects always with its origin, therefore we need to check for another
-            # intersection.
-            if intersections >= 3:
-                return True
-            jterator += 1
-        iterator += 1
-    return False
+    width_lines = lines_to_segments(width_lines)
+    query, _ = SegmentIndex(lines_to_segments(control_points_lines)).intersections(width_lines)
+    # One line intersects always with its origin, therefore we need to check for another intersection.
+    return bool((np.bincount(query, minlength=len(width_lines)) >= 3).any())
 
 
 def spline_intersection_check(control_points):
     """Checks for intersection of a splined list. New point must be already
      added to the list.
-    :param control_points: List of dicts containing points.
+    :param control_points: Array of points.
     :return: {@code True} if the last line intersects with any other, {@code False} if not.
     """
-    iterator = 0
-    while iterator <= (len(control_points) - 4):
-        p1 = (control_points[iterator][0], control_points[iterator][1])
-        p2 = (control_points[iterator + 1][0], control_points[iterator + 1][1])
-        p3 = (control_points[-2][0], control_points[-2][1])
-        p4 = (control_points[-1][0], control_points[-1][1])
-        line1 = LineString([p1, p2])
-        line2 = LineString([p3, p4])
-        if line1.intersects(line2):
-            return True
-        iterator += 1
-    return False
+    if len(control_points) < 4:
+        return False
+    segments = points_to_segments(control_points)
+    return bool(segments_intersect(segments[:-2], segments[-1]).any())
 
 
 def intersection_check_all(control_points):
@@ -73,39 +202,12 @@ def intersection_check_all(control_points):
     :param control_points: List of dicts containing points.
     :return: {@code True} if two lines intersects, {@code False} if not.
     """
-    iterator = 0
-    while iterator < (len(control_points) - 1):
-        jterator = iterator + 2
-        p1 = (control_points[iterator].get("x"), control_points[iterator].get("y"))
-        p2 = (control_points[iterator + 1].get("x"), control_points[iterator + 1].get("y"))
-        line1 = LineString([p1, p2])
-        while jterator < (len(control_points) - 1):
-            p3 = (control_points[jterator].get("x"), control_points[jterator].get("y"))
-            p4 = (control_points[jterator + 1].get("x"), control_points[jterator + 1].get("y"))
-            line2 = LineString([p3, p4])
-            if line1.intersects(line2):
-                return True
-            jterator += 1
-        iterator += 1
-    return False
+    return _self_intersects(points_to_segments(control_points))
+
 
 def intersection_check_all_np(control_points):
     """Checks for intersection between all lines of two connected control points.
     :param control_points: Numpy array containing points.
     :return: {@code True} if two lines intersects, {@code False} if not.
     """
-    iterator = 0
-    while iterator < (len(control_points) - 1):
-        jterator = iterator + 2
-        p1 = (control_points[iterator][0], control_points[iterator][1])
-        p2 = (control_points[iterator + 1][0], control_points[iterator + 1][1])
-        line1 = LineString([p1, p2])
-        while jterator < (len(control_points) - 1):
-            p3 = (control_points[jterator][0], control_points[jterator][1])
-            p4 = (control_points[jterator + 1][0], control_points[jterator + 1][1])
-            line2 = LineString([p3, p4])
-            if line1.intersects(line2):
-                return True
-            jterator += 1
-        iterator += 1
-    return False
+    return _self_intersects(points_to_segments(control_points))
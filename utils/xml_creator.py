@@ -5,6 +5,34 @@
 
 from utils.dbe_xml_builder import DBEBuilder
 from utils.dbc_xml_builder import DBCBuilder
+from utils.files import write_files
+
+
+def _coordinates(point):
+    """Returns the coordinates of a point.
+    :param point: Dict containing a point or array of shape (2,).
+    :return: Tuple of x and y.
+    """
+    if isinstance(point, dict):
+        return point.get("x"), point.get("y")
+    return tuple(point.tolist())
+
+
+def create_environment_xml(control_points, left_lanes=0, right_lanes=0, obstacles=[], stream=False, width=None):
+    """Creates a dbe xml tree without saving it.
+    :param control_points: List of dicts containing control points or array of shape (N, 2).
+    :param left_lanes: Number of left lanes.
+    :param right_lanes: Number of right lanes.
+    :param obstacles: List of dicts containing obstacles.
+    :param stream: {@code True} to render the road segments only when the file is serialized.
+    :param width: Width of the road if control_points is an array.
+    :return: DBEBuilder.
+    """
+    dbe = DBEBuilder()
+    dbe.add_lane(control_points, left_lanes=left_lanes, right_lanes=right_lanes, stream=stream, width=width)
+    if obstacles is not None and len(obstacles) > 0:
+        dbe.add_obstacles(obstacles)
+    return dbe
 
 
 def build_environment_xml(control_points, file_name="exampleTest", left_lanes=0, right_lanes=0, obstacles=[]):
@@ -15,11 +43,28 @@ def build_environment_xml(control_points, file_name="exampleTest", left_lanes=0,
     :param right_lanes: Number of right lanes.
     :param obstacles: List of dicts containing obstacles.
     """
-    dbe = DBEBuilder()
-    dbe.add_lane(control_points, left_lanes=left_lanes, right_lanes=right_lanes)
-    if obstacles is not None and len(obstacles) > 0:
-        dbe.add_obstacles(obstacles)
-    dbe.save_xml(file_name)
+    create_environment_xml(control_points, left_lanes, right_lanes, obstacles).save_xml(file_name)
+
+
+def create_criteria_xml(participants: list, ego_car: dict, success_points: list, vc_pos, sc_speed,
+                        file_name: str ="exampleTest", name: str ="Example Test", fps: str ="60",
+                        frequency: str ="6", stream: bool = False):
+    """Creates a dbc xml tree without saving it. See build_criteria_xml.
+    :param stream: {@code True} to render the waypoints only when the file is serialized.
+    :return: DBCBuilder.
+    """
+    dbc = DBCBuilder()
+    dbc.define_name(name)
+    dbc.environment_name(file_name)
+    dbc.steps_per_second(fps)
+    dbc.ai_freq(frequency)
+    for participant in participants:
+        dbc.add_car(participant, stream)
+    for success_point in success_points:
+        dbc.add_success_point(ego_car.get("id"), success_point)
+    dbc.add_failure_conditions(ego_car.get("id"), "offroad")
+    dbc.add_precond_partic_sc_speed(vc_pos, sc_speed)
+    return dbc
 
 
 def build_criteria_xml(participants: list, ego_car: dict, success_points: list, vc_pos, sc_speed, file_name: str ="exampleTest",
@@ -39,37 +84,43 @@ def build_criteria_xml(participants: list, ego_car: dict, success_points: list,
     :param frequency: Frequency of the AI to compute the next step.
     :return: Void.
     """
-    dbc = DBCBuilder()
-    dbc.define_name(name)
-    dbc.environment_name(file_name)
-    dbc.steps_per_second(fps)
-    dbc.ai_freq(frequency)
-    for participant in participants:
-        dbc.add_car(participant)
-    for success_point in success_points:
-        dbc.add_success_point(ego_car.get("id"), success_point)
-    dbc.add_failure_conditions(ego_car.get("id"), "offroad")
-    dbc.add_precond_partic_sc_speed(vc_pos, sc_speed)
-    dbc.save_xml(file_name)
+    create_criteria_xml(participants, ego_car, success_points, vc_pos, sc_speed, file_name, name, fps,
+                        frequency).save_xml(file_name)
 
 
-def build_xml(individual, iterator: int = 0):
-    """Builds an environment and criteria xml file out of a list of control points.
+def render_xml(individual, iterator: int = 0, name: str = None, pretty: bool = True, stream: bool = True):
+    """Creates the environment and criteria xml file of an individual in memory.
     :param individual: obstacles (list), number of right lanes (int), number of left lanes (int),
                         control points (list), file name (string), participants (list)
     :param iterator: Unique index of a population.
-    :return: Void.
+    :param name: Name of the test. Defaults to the file name.
+    :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
+    :param stream: {@code True} to render the road segments and waypoints directly into the files without adding
+                   them to the xml trees. The files are the same.
+    :return: Tuple of the test name and a dict with the file names as keys and the contents as bytes as values.
     """
     obstacles = individual.get("obstacles")
     right_lanes = individual.get("right_lanes")
     left_lanes = individual.get("left_lanes")
-    control_points = individual.get("control_points")
     file_name = individual.get("file_name")
     participants = individual.get("participants")
     file_name = file_name + str(iterator)
-    success_point = {"x": control_points[-1].get("x"),
-                     "y": control_points[-1].get("y"),
-                     "tolerance": control_points[-1].get("width") / 2}
+    if name is None:
+        name = file_name
+
+    # Individuals offer their control points as array, which can be streamed without creating a dict per point.
+    points = getattr(individual, "points", None) if stream else None
+    if points is None:
+        control_points = individual.get("control_points")
+        width = control_points[-1].get("width")
+    else:
+        control_points = points
+        width = individual.get("width")
+    last_point = _coordinates(control_points[-1])
+    second_point = _coordinates(control_points[1])
+    success_point = {"x": last_point[0],
+                     "y": last_point[1],
+                     "tolerance": width / 2}
     success_points = [success_point]
     ego = None
     for participant in participants:
@@ -78,21 +129,51 @@ def build_xml(individual, iterator: int = 0):
             break
     vc_pos = {"id": ego.get("id"),
               "tolerance": 3,
-              "x": control_points[1].get("x"),
-              "y": control_points[1].get("y")}
+              "x": second_point[0],
+              "y": second_point[1]}
     sc_speed = 10
-    build_environment_xml(control_points=control_points, file_name=file_name, left_lanes=left_lanes,
-                          right_lanes=right_lanes, obstacles=obstacles)
-    build_criteria_xml(participants=participants, ego_car=ego, success_points=success_points,
-                       file_name=file_name, vc_pos=vc_pos, sc_speed=sc_speed)
+    dbe = create_environment_xml(control_points=control_points, left_lanes=left_lanes, right_lanes=right_lanes,
+                                 obstacles=obstacles, stream=stream, width=width)
+    dbc = create_criteria_xml(participants=participants, ego_car=ego, success_points=success_points,
+                              file_name=file_name, vc_pos=vc_pos, sc_speed=sc_speed, name=name, stream=stream)
+    return name, {file_name + ".dbe.xml": dbe.to_bytes(pretty), file_name + ".dbc.xml": dbc.to_bytes(pretty)}
+
+
+def build_xml(individual, iterator: int = 0, name: str = None, pretty: bool = True, stream: bool = True):
+    """Builds an environment and criteria xml file out of a list of control points.
+    :param individual: obstacles (list), number of right lanes (int), number of left lanes (int),
+                        control points (list), file name (string), participants (list)
+    :param iterator: Unique index of a population.
+    :param name: Name of the test. Defaults to the file name.
+    :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
+    :param stream: {@code True} to render the road segments and waypoints without adding them to the xml trees.
+    :return: Name of the test.
+    """
+    name, files = render_xml(individual, iterator, name, pretty, stream)
+    write_files(files)
+    return name
 
 
-def build_all_xml(population):
-    """Calls the build_xml method for each individual.
+def build_all_xml(population, generation: int = None, pretty: bool = True, folder: str = None, stream: bool = True):
+    """Creates the xml files of all individuals in memory and writes them in one go.
     :param population: List of individuals containing control points and a fitness value for each one.
-    :return: Void.
+    :param generation: Number of the generation. It is added to the test names, so they are unique over all
+                       generations.
+    :param pretty: {@code True} to indent the tags, {@code False} to skip the pretty printing.
+    :param folder: Target folder, defaults to the scenario folder.
+    :param stream: {@code True} to render the road segments and waypoints without adding them to the xml trees.
+    :return: List of test names in the order of the population.
     """
+    names = []
+    files = {}
     iterator = 0
     while iterator < len(population):
-        build_xml(population[iterator], iterator)
+        name = None
+        if generation is not None:
+            name = "{}{} generation {}".format(population[iterator].get("file_name"), iterator, generation)
+        name, individual_files = render_xml(population[iterator], iterator, name, pretty, stream)
+        names.append(name)
+        files.update(individual_files)
         iterator += 1
+    write_files(files, folder)
+    return names
@@ -0,0 +1,42 @@
+"""This file offers the streaming mode of the xml builders. Long lists of equal tags (like laneSegment or waypoint)
+  are not added to the tree. The tree only gets one placeholder tag, which is replaced by the rendered tags after the
+  tree was serialized. The result is exactly the same as if every tag was added to the tree.
+"""
+
+from itertools import count
+
+import xml.etree.ElementTree as ElementTree
+
+_ids = count()
+
+
+class StreamedTags:
+    """Collects the placeholders of a tree and the tags which replace them."""
+
+    def __init__(self):
+        self._streams = []
+
+    def add(self, parent, tags, level):
+        """Adds a placeholder for a list of tags to the tree.
+        :param parent: Parent element of the tags.
+        :param tags: List of tags as strings, e.g. 'laneSegment x="1" y="2" width="4"'.
+        :param level: Depth of the tags in the tree (the root has depth 0), needed for the pretty printing.
+        :return: Void.
+        """
+        if len(tags) == 0:
+            return
+        placeholder = "xmlStream{}".format(next(_ids))
+        ElementTree.SubElement(parent, placeholder)
+        self._streams.append((placeholder, tags, level))
+
+    def splice(self, data, pretty=True):
+        """Replaces the placeholders of a serialized tree with the rendered tags.
+        :param data: Serialized tree as bytes.
+        :param pretty: {@code True} if the tree was pretty printed.
+        :return: Serialized tree with all tags as bytes.
+        """
+        for placeholder, tags, level in self._streams:
+            separator = "\n" + level * "    " if pretty else ""
+            rendered = separator.join("<" + tag + " />" for tag in tags)
+            data = data.replace(("<" + placeholder + " />").encode("utf-8"), rendered.encode("utf-8"), 1)
+        return data